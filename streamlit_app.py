@@ -2,20 +2,23 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import os
-import plotly.express as px
 from datetime import datetime
 import time
 import base64
 from io import BytesIO
 
 # Import functions from utility modules
-from utils.data_processor import (
-    find_csv_files, process_csv_files, parse_excel_file, 
-    filter_data_by_time_and_sensors, check_data_loss, vtn_imputation,
-    process_csv_files_cached, parse_excel_file_cached, list_existing_files  # เพิ่มฟังก์ชันใหม่
+from utils.data_processor import process_csv_files_cached
+from utils.mapping_plan import load_mapping_plan
+from utils.events import build_event_index_cached
+from utils.data_catalog import refresh_catalog, select_files_for_window
+from utils.visualization import (
+    create_temperature_chart, create_humidity_chart, create_heatmap_chart,
+    build_heatmap_frames, load_sensor_positions
 )
-from utils.visualization import create_temperature_chart, create_humidity_chart
-from utils.analysis import calculate_statistics, get_ai_analysis, export_statistics_to_excel
+from utils.job_scheduler import JOB_FAILED
+from utils.api_service import AnalysisService
+from utils.live_ingest import CsvTailer, SocketFeed, LiveStore
 
 # Set page configuration
 st.set_page_config(
@@ -38,6 +41,153 @@ def get_csv_download_link(df, filename, link_text):
     href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{link_text}</a>'
     return href
 
+# Shared analysis service for all sessions (survives reruns and browser refreshes)
+@st.cache_resource
+def get_analysis_service():
+    return AnalysisService(max_workers=2, export_dir="data/reports")
+
+def apply_job_result(job):
+    """Copy a finished job's result into session state for the Results tab"""
+    if st.session_state.applied_job_id == job.job_id:
+        return
+    for key in ('filled_data', 'sensor_columns_temp', 'sensor_columns_humidity', 'room_number',
+                'room_name', 'start_sensor', 'end_sensor', 'temp_stats', 'humidity_stats',
+                'ai_analysis', 'export_path', 'csv_export_path'):
+        st.session_state[key] = job.result[key]
+    # Jobs saved before excursions were part of the result have none
+    st.session_state.excursions = job.result.get('excursions')
+    st.session_state.start_time = pd.to_datetime(job.params['start_time'])
+    st.session_state.end_time = pd.to_datetime(job.params['end_time'])
+    # Precompute downsampled heatmap frames once per analysis
+    st.session_state.heatmap_frames = {
+        "Temperature": build_heatmap_frames(job.result['filled_data'], job.result['sensor_columns_temp']),
+        "Humidity": build_heatmap_frames(job.result['filled_data'], job.result['sensor_columns_humidity']),
+    }
+    st.session_state.analysis_done = True
+    st.session_state.applied_job_id = job.job_id
+
+@st.fragment(run_every=1)
+def poll_job_progress(job_id):
+    """Poll an unfinished analysis job without rerunning the whole script"""
+    job = get_analysis_service().get_job(job_id)
+    if job is None or job.is_finished:
+        # Rerun the whole app so the Analysis and Results tabs pick up the outcome
+        st.rerun()
+    st.progress(job.progress, text=f"Step {job.step}/{job.total_steps}: {job.step_name or 'Waiting in queue'}...")
+
+def show_job_status(job_id):
+    """Show the status of an analysis job, or its results once it has finished"""
+    job = get_analysis_service().get_job(job_id)
+    if job is None:
+        st.warning("⚠️ Analysis job not found. Please run the analysis again.")
+        return
+    
+    if not job.is_finished:
+        poll_job_progress(job_id)
+        return
+    
+    if job.status == JOB_FAILED:
+        st.error(f"❌ {job.error}")
+        return
+    
+    result = job.result
+    if 'filled_data' in result:
+        apply_job_result(job)
+    else:
+        st.warning("⚠️ The processed data for this job is no longer available, so charts cannot be shown. Please run the analysis again.")
+    
+    # Display data preview
+    st.success(f"✅ Found {result['data_points']} data points for analysis")
+    with st.expander("Preview Raw Data"):
+        st.dataframe(result['preview'])
+    
+    # Data loss check
+    st.subheader("Data Loss Check")
+    if result['data_loss_warnings']:
+        st.warning("\n".join(result['data_loss_warnings']))
+    else:
+        st.success("✅ No significant data loss detected")
+    
+    with st.expander("View Detailed Data Loss Report"):
+        st.text("\n".join(result['data_loss_results']))
+    
+    if 'filled_data' in result:
+        st.success("✅ Analysis completed successfully! Go to Results tab to view.")
+
+def show_report_job_status(job_id):
+    """Show the status of a study report job and a download link once it has finished"""
+    job = get_analysis_service().get_job(job_id)
+    if job is None:
+        st.warning("⚠️ Report job not found. Please generate the report again.")
+        return
+    
+    if not job.is_finished:
+        poll_job_progress(job_id)
+        return
+    
+    if job.status == JOB_FAILED:
+        st.error(f"❌ {job.error}")
+        return
+    
+    result = job.result
+    st.success(f"✅ Study report generated for {result['rooms']} rooms")
+    if result['failed_rooms']:
+        st.warning(f"⚠️ Rooms without results: {', '.join(result['failed_rooms'])}")
+    st.markdown(get_excel_download_link(
+        result['report_path'],
+        "📊 Download Study Excel Report"
+    ), unsafe_allow_html=True)
+
+# One socket listener per port, shared across reruns and sessions (each session reads through its own subscription)
+@st.cache_resource
+def get_socket_feed(port):
+    return SocketFeed(port=port)
+
+@st.fragment(run_every=5)
+def show_live_updates(sensor_columns_temp, sensor_columns_humidity, chart_minutes):
+    """Append new rows from the live source and refresh stats, gaps and charts"""
+    store = st.session_state.live_store
+    try:
+        added = store.update(st.session_state.live_source.read_new_rows())
+    except Exception as e:
+        st.error(f"❌ Error reading live data: {str(e)}")
+        return
+    
+    if store.total_rows == 0:
+        st.info("Waiting for data...")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rows received", store.total_rows, delta=added or None)
+    col2.metric("Last reading", str(store.last_timestamp))
+    gaps = store.gaps()
+    col3.metric("Data loss periods", store.gap_count)
+    
+    recent_data = store.recent(chart_minutes)
+    temp_columns = [col for col in sensor_columns_temp if col in recent_data.columns]
+    humidity_columns = [col for col in sensor_columns_humidity if col in recent_data.columns]
+    st.plotly_chart(create_temperature_chart(
+        recent_data, temp_columns, "Live", f"last {chart_minutes} minutes",
+        sensor_columns_temp[0].replace("TempSensor", ""), sensor_columns_temp[-1].replace("TempSensor", "")
+    ), use_container_width=True)
+    st.plotly_chart(create_humidity_chart(
+        recent_data, humidity_columns, "Live", f"last {chart_minutes} minutes",
+        sensor_columns_humidity[0].replace("RHSensor", ""), sensor_columns_humidity[-1].replace("RHSensor", "")
+    ), use_container_width=True)
+    
+    stats = store.statistics()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Running Temperature Statistics**")
+        st.dataframe(stats[[col for col in sensor_columns_temp if col in stats.columns]], use_container_width=True)
+    with col2:
+        st.markdown("**Running Humidity Statistics**")
+        st.dataframe(stats[[col for col in sensor_columns_humidity if col in stats.columns]], use_container_width=True)
+    
+    st.markdown("**Data Loss Periods**")
+    sensors = [int(col.replace("TempSensor", "")) for col in sensor_columns_temp]
+    st.dataframe(gaps[gaps['sensor'].isin(sensors)], use_container_width=True)
+
 # Create necessary directories if they don't exist
 os.makedirs("data/csv", exist_ok=True)
 os.makedirs("data/excel", exist_ok=True)
@@ -60,21 +210,44 @@ if 'all_data' not in st.session_state:
     st.session_state.all_data = None
 if 'index_df' not in st.session_state:
     st.session_state.index_df = None
+if 'mapping_plan' not in st.session_state:
+    st.session_state.mapping_plan = None
+if 'events' not in st.session_state:
+    st.session_state.events = None
 if 'analysis_done' not in st.session_state:
     st.session_state.analysis_done = False
 if 'export_path' not in st.session_state:
     st.session_state.export_path = None
+if 'job_id' not in st.session_state:
+    # Restore the running job after a browser refresh
+    st.session_state.job_id = st.query_params.get("job")
+if 'applied_job_id' not in st.session_state:
+    st.session_state.applied_job_id = None
+if 'live_store' not in st.session_state:
+    st.session_state.live_store = None
+if 'live_source' not in st.session_state:
+    st.session_state.live_source = None
+if 'live_source_key' not in st.session_state:
+    st.session_state.live_source_key = None
+if 'report_job_id' not in st.session_state:
+    st.session_state.report_job_id = st.query_params.get("report_job")
 
 # Create tabs for different parts of the application
-tab1, tab2, tab3 = st.tabs(["📂 Data Upload", "📊 Analysis", "📝 Results"])
+tab1, tab2, tab3, tab4 = st.tabs(["📂 Data Upload", "📊 Analysis", "📝 Results", "📡 Live Monitoring"])
 
 # Tab 1: Data Upload
 with tab1:
     st.header("Upload Data Files")
     
-    # ตรวจสอบไฟล์ที่มีอยู่ในระบบ
-    existing_csv_files = list_existing_files("data/csv", ".csv")
-    existing_excel_files = list_existing_files("data/excel", ".xlsx")
+    # ตรวจสอบไฟล์ที่มีอยู่ในระบบ (อ่านเฉพาะไฟล์ที่เปลี่ยนแปลงผ่าน catalog)
+    csv_catalog = refresh_catalog("data/csv", ".csv")
+    unreadable_csv_files = [entry for entry in csv_catalog if entry.get('error')]
+    if unreadable_csv_files:
+        st.warning("⚠️ ไม่สามารถอ่านไฟล์ CSV ต่อไปนี้ได้:\n\n" + "\n".join(f"- {os.path.basename(entry['path'])}: {entry['error']}" for entry in unreadable_csv_files))
+    csv_catalog = [entry for entry in csv_catalog if not entry.get('error')]
+    csv_checksums = {entry['path']: entry['checksum'] for entry in csv_catalog}
+    existing_csv_files = [entry['path'] for entry in csv_catalog]
+    existing_excel_files = [entry['path'] for entry in refresh_catalog("data/excel", ".xlsx")]
     
     # เพิ่ม checkbox สำหรับเลือกใช้ไฟล์ที่มีอยู่หรืออัปโหลดใหม่
     use_existing_files = st.checkbox("ใช้ไฟล์ที่มีอยู่ในระบบ", value=bool(existing_csv_files and existing_excel_files))
@@ -82,25 +255,7 @@ with tab1:
     if use_existing_files and (existing_csv_files or existing_excel_files):
         col1, col2 = st.columns(2)
         
-        with col1:
-            st.subheader("ไฟล์ CSV ที่มีอยู่")
-            if existing_csv_files:
-                # เลือกไฟล์ที่มีอยู่แล้ว
-                selected_csv_files = st.multiselect(
-                    "เลือกไฟล์ CSV ที่ต้องการใช้", 
-                    options=existing_csv_files,
-                    default=existing_csv_files,
-                    format_func=lambda x: os.path.basename(x)
-                )
-                
-                if selected_csv_files:
-                    with st.spinner("กำลังประมวลผลไฟล์ CSV..."):
-                        st.session_state.all_data = process_csv_files_cached(selected_csv_files)
-                        st.session_state.csv_files_uploaded = True
-                    st.success(f"✅ ประมวลผล {len(selected_csv_files)} ไฟล์ CSV ที่มี {len(st.session_state.all_data)} จุดข้อมูล")
-            else:
-                st.info("ไม่พบไฟล์ CSV ในระบบ กรุณาอัปโหลดไฟล์ใหม่")
-        
+        # โหลดแผนแมพปิ้งก่อน เพื่อให้เลือกไฟล์ CSV ตามช่วงเวลาของห้องได้ตั้งแต่การโหลดครั้งแรก
         with col2:
             st.subheader("ไฟล์ Excel ที่มีอยู่")
             if existing_excel_files:
@@ -113,9 +268,12 @@ with tab1:
                 if selected_excel:
                     with st.spinner("กำลังประมวลผลไฟล์ Excel..."):
                         try:
-                            st.session_state.index_df = parse_excel_file_cached(selected_excel)
+                            st.session_state.mapping_plan = load_mapping_plan(selected_excel)
+                            st.session_state.index_df = st.session_state.mapping_plan.to_dataframe()
                             st.session_state.excel_file_uploaded = True
                             st.success(f"✅ ประมวลผลไฟล์ Excel เรียบร้อยแล้ว มี {len(st.session_state.index_df)} รายการแมพปิ้ง")
+                            if st.session_state.mapping_plan.issues:
+                                st.warning("⚠️ พบรายการในแผนแมพปิ้งที่ไม่ถูกต้องหรือซ้อนทับกัน:\n\n" + "\n".join(f"- {issue}" for issue in st.session_state.mapping_plan.issues))
                             
                             # แสดงตัวอย่างข้อมูล Excel
                             with st.expander("ดูข้อมูลแผนแมพปิ้ง"):
@@ -124,6 +282,45 @@ with tab1:
                             st.error(f"❌ เกิดข้อผิดพลาดในการประมวลผลไฟล์ Excel: {str(e)}")
             else:
                 st.info("ไม่พบไฟล์ Excel ในระบบ กรุณาอัปโหลดไฟล์ใหม่")
+        
+        with col1:
+            st.subheader("ไฟล์ CSV ที่มีอยู่")
+            if existing_csv_files:
+                default_csv_files = existing_csv_files
+                
+                # เลือกเฉพาะไฟล์ที่ครอบคลุมช่วงเวลาของห้องที่ต้องการ (ถ้ามีแผนแมพปิ้งแล้ว)
+                if st.session_state.mapping_plan is not None:
+                    room_windows = {
+                        f"{entry.room_number} - {entry.room_name} ({entry.start_time} to {entry.end_time})": (entry.start_time, entry.end_time)
+                        for entry in st.session_state.mapping_plan.scheduled_entries()
+                    }
+                    # ค่าเริ่มต้นคือช่วงเวลาของห้องแรกในแผน จึงไม่ต้องโหลดทุกไฟล์
+                    selected_window = st.selectbox(
+                        "เลือกไฟล์อัตโนมัติตามช่วงเวลาของห้อง",
+                        options=["ทุกไฟล์"] + list(room_windows),
+                        index=1 if room_windows else 0
+                    )
+                    if selected_window in room_windows:
+                        default_csv_files = select_files_for_window(csv_catalog, *room_windows[selected_window])
+                
+                # เลือกไฟล์ที่มีอยู่แล้ว
+                selected_csv_files = st.multiselect(
+                    "เลือกไฟล์ CSV ที่ต้องการใช้", 
+                    options=existing_csv_files,
+                    default=default_csv_files,
+                    format_func=lambda x: os.path.basename(x)
+                )
+                
+                if selected_csv_files:
+                    with st.spinner("กำลังประมวลผลไฟล์ CSV..."):
+                        st.session_state.all_data = process_csv_files_cached(
+                            selected_csv_files, [csv_checksums[path] for path in selected_csv_files]
+                        )
+                        st.session_state.events = build_event_index_cached(st.session_state.all_data)
+                        st.session_state.csv_files_uploaded = True
+                    st.success(f"✅ ประมวลผล {len(selected_csv_files)} ไฟล์ CSV ที่มี {len(st.session_state.all_data)} จุดข้อมูล")
+            else:
+                st.info("ไม่พบไฟล์ CSV ในระบบ กรุณาอัปโหลดไฟล์ใหม่")
     
     # แสดงส่วนอัปโหลดไฟล์ใหม่
     if not use_existing_files or not (existing_csv_files and existing_excel_files):
@@ -143,10 +340,14 @@ with tab1:
                 st.success(f"✅ อัปโหลด {len(uploaded_csv_files)} ไฟล์ CSV สำเร็จ!")
                 
                 # ค้นหาและประมวลผลไฟล์ CSV ทั้งหมด
-                csv_files = find_csv_files("data/csv")
+                csv_catalog = [entry for entry in refresh_catalog("data/csv", ".csv") if not entry.get('error')]
+                csv_files = [entry['path'] for entry in csv_catalog]
                 if csv_files:
                     with st.spinner("กำลังประมวลผลไฟล์ CSV..."):
-                        st.session_state.all_data = process_csv_files_cached(csv_files)
+                        st.session_state.all_data = process_csv_files_cached(
+                            csv_files, [entry['checksum'] for entry in csv_catalog]
+                        )
+                        st.session_state.events = build_event_index_cached(st.session_state.all_data)
                         st.session_state.csv_files_uploaded = True
                     st.success(f"✅ ประมวลผล {len(csv_files)} ไฟล์ CSV ที่มี {len(st.session_state.all_data)} จุดข้อมูล")
         
@@ -165,9 +366,12 @@ with tab1:
                 # ประมวลผลไฟล์ Excel
                 with st.spinner("กำลังประมวลผลไฟล์ Excel..."):
                     try:
-                        st.session_state.index_df = parse_excel_file_cached(excel_path)
+                        st.session_state.mapping_plan = load_mapping_plan(excel_path)
+                        st.session_state.index_df = st.session_state.mapping_plan.to_dataframe()
                         st.session_state.excel_file_uploaded = True
                         st.success(f"✅ ประมวลผลไฟล์ Excel เรียบร้อยแล้ว มี {len(st.session_state.index_df)} รายการแมพปิ้ง")
+                        if st.session_state.mapping_plan.issues:
+                            st.warning("⚠️ พบรายการในแผนแมพปิ้งที่ไม่ถูกต้องหรือซ้อนทับกัน:\n\n" + "\n".join(f"- {issue}" for issue in st.session_state.mapping_plan.issues))
                         
                         # แสดงตัวอย่างข้อมูล Excel
                         with st.expander("ดูข้อมูลแผนแมพปิ้ง"):
@@ -185,24 +389,19 @@ with tab2:
         # Display selection for analysis
         st.subheader("Select Room to Analyze")
         
-        # Create options from index_df
-        options = []
-        for idx, row in st.session_state.index_df.iterrows():
-            if pd.notna(row['room number']) and pd.notna(row['room name']):
-                options.append(f"{idx}: {row['room number']} - {row['room name']}")
+        # Create options from the compiled mapping plan
+        options = st.session_state.mapping_plan.room_options()
         
         if options:
-            selected_option = st.selectbox("Select room for analysis:", options)
-            selected_idx = int(selected_option.split(":")[0])
+            entry = st.selectbox("Select room for analysis:", options, format_func=lambda e: e.label)
             
-            # Extract data for selected index
-            row = st.session_state.index_df.loc[selected_idx]
-            start_time = row['start_time']
-            end_time = row['end_time']
-            start_sensor = int(row['Sensor start'])
-            end_sensor = int(row['Sensor stop'])
-            room_number = row['room number']
-            room_name = row['room name']
+            # Extract data for selected room
+            start_time = entry.start_time
+            end_time = entry.end_time
+            start_sensor = entry.start_sensor
+            end_sensor = entry.end_sensor
+            room_number = entry.room_number
+            room_name = entry.room_name
             
             st.info(f"Selected: {room_number}: {room_name} (Sensors {start_sensor}-{end_sensor}, {start_time} to {end_time})")
             
@@ -226,6 +425,14 @@ with tab2:
                             exclude_sensors = [int(x.strip()) for x in exclude_sensors_str.split(",")]
                         except:
                             st.error("Invalid format for exclude sensors")
+                
+                # Check the override sensors against the mapping plan
+                sensor_conflicts = st.session_state.mapping_plan.sensor_conflicts(entry, additional_sensors)
+                if sensor_conflicts:
+                    st.warning("⚠️ Added sensors are placed in other rooms during this window:\n\n" + "\n".join(f"- {conflict}" for conflict in sensor_conflicts))
+                unused_exclusions = [sensor for sensor in exclude_sensors if sensor not in entry.sensors + additional_sensors]
+                if unused_exclusions:
+                    st.warning(f"⚠️ Excluded sensors are not part of this room: {', '.join(map(str, unused_exclusions))}")
             
             # Google API key for AI analysis
             with st.expander("AI Analysis Settings"):
@@ -233,74 +440,38 @@ with tab2:
             
             # Analysis button
             if st.button("Analyze Data"):
-                with st.spinner("Analyzing data... This may take a few minutes."):
-                    # 1. Filter data
-                    selected_data, sensor_columns_temp, sensor_columns_humidity = filter_data_by_time_and_sensors(
-                        st.session_state.all_data, 
-                        start_time, 
-                        end_time, 
-                        start_sensor, 
-                        end_sensor,
-                        additional_sensors,
-                        exclude_sensors
-                    )
-                    
-                    if len(selected_data) == 0:
-                        st.error("❌ No data found for the selected time period.")
-                    else:
-                        # Display data preview
-                        st.success(f"✅ Found {len(selected_data)} data points for analysis")
-                        with st.expander("Preview Raw Data"):
-                            st.dataframe(selected_data.head(10))
-                        
-                        # 2. Check for data loss
-                        st.subheader("Data Loss Check")
-                        data_loss_results, data_loss_warnings = check_data_loss(selected_data, start_sensor)
-                        
-                        if data_loss_warnings:
-                            st.warning("\n".join(data_loss_warnings))
-                        else:
-                            st.success("✅ No significant data loss detected")
-                        
-                        with st.expander("View Detailed Data Loss Report"):
-                            st.text("\n".join(data_loss_results))
-                        
-                        # 3. Fill missing data
-                        filled_data = vtn_imputation(selected_data, sensor_columns_temp, sensor_columns_humidity)
-                        
-                        # 4. Store processed data for tab 3
-                        st.session_state.filled_data = filled_data
-                        st.session_state.sensor_columns_temp = sensor_columns_temp
-                        st.session_state.sensor_columns_humidity = sensor_columns_humidity
-                        st.session_state.room_number = room_number
-                        st.session_state.room_name = room_name
-                        st.session_state.start_sensor = start_sensor
-                        st.session_state.end_sensor = end_sensor
-                        
-                        # 5. Calculate statistics
-                        temp_stats, humidity_stats = calculate_statistics(
-                            filled_data, sensor_columns_temp, sensor_columns_humidity
-                        )
-                        st.session_state.temp_stats = temp_stats
-                        st.session_state.humidity_stats = humidity_stats
-                        
-                        # 6. Get AI analysis
-                        ai_analysis = get_ai_analysis(temp_stats, humidity_stats, room_number, room_name, api_key)
-                        st.session_state.ai_analysis = ai_analysis
-                        
-                        # 7. Export results
-                        export_path = export_statistics_to_excel(
-                            temp_stats, humidity_stats, room_number, room_name, "data/reports"
-                        )
-                        st.session_state.export_path = export_path
-                        
-                        # 8. Save processed data to CSV
-                        csv_export_path = os.path.join("data/reports", f"{room_number}_{room_name}_processed_data.csv")
-                        filled_data.to_csv(csv_export_path, index=False)
-                        st.session_state.csv_export_path = csv_export_path
-                        
-                        st.session_state.analysis_done = True
-                        st.success("✅ Analysis completed successfully! Go to Results tab to view.")
+                job_id = get_analysis_service().submit_analysis({
+                    'room_number': room_number,
+                    'room_name': room_name,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'start_sensor': start_sensor,
+                    'end_sensor': end_sensor,
+                    'additional_sensors': additional_sensors,
+                    'exclude_sensors': exclude_sensors,
+                    'api_key': api_key
+                }, st.session_state.all_data, st.session_state.events)
+                st.session_state.job_id = job_id
+                st.query_params["job"] = job_id
+            
+            if st.session_state.job_id:
+                show_job_status(st.session_state.job_id)
+        
+        # Consolidated report for every scheduled room in the mapping plan
+        st.subheader("Study Report")
+        scheduled_rooms = st.session_state.mapping_plan.scheduled_entries()
+        st.markdown(f"Generate one Excel workbook with a sheet per room and a summary sheet for all {len(scheduled_rooms)} scheduled rooms.")
+        include_series = st.checkbox("Include raw and imputed data sheets (larger file)")
+        
+        if st.button("Generate Study Report", disabled=not scheduled_rooms):
+            report_job_id = get_analysis_service().submit_study_report(
+                include_series, all_data=st.session_state.all_data, plan=st.session_state.mapping_plan
+            )
+            st.session_state.report_job_id = report_job_id
+            st.query_params["report_job"] = report_job_id
+        
+        if st.session_state.report_job_id:
+            show_report_job_status(st.session_state.report_job_id)
 
 # Tab 3: Results
 with tab3:
@@ -332,6 +503,30 @@ with tab3:
         )
         st.plotly_chart(humidity_chart, use_container_width=True)
         
+        # Spatial heatmap animated from the precomputed frames
+        st.subheader("Sensor Heatmap")
+        col1, col2 = st.columns(2)
+        with col1:
+            heatmap_measure = st.radio("Measure:", ["Temperature", "Humidity"], horizontal=True)
+        with col2:
+            positions_file = st.file_uploader("Sensor position layout (optional CSV with sensor, x, y columns)", type="csv")
+        
+        sensor_positions = None
+        if positions_file:
+            try:
+                sensor_positions = load_sensor_positions(positions_file)
+            except Exception as e:
+                st.error(f"❌ Error reading sensor position file: {str(e)}")
+        
+        heatmap_chart = create_heatmap_chart(
+            st.session_state.heatmap_frames[heatmap_measure],
+            st.session_state.room_number,
+            st.session_state.room_name,
+            heatmap_measure,
+            sensor_positions
+        )
+        st.plotly_chart(heatmap_chart, use_container_width=True)
+        
         # Display statistics
         st.subheader("Statistical Analysis")
         
@@ -345,6 +540,16 @@ with tab3:
             st.markdown("**Humidity Statistics**")
             st.dataframe(st.session_state.humidity_stats, use_container_width=True)
         
+        # Display the excursions the analysis job summarized from the data it ran on
+        st.subheader("Excursion Summary")
+        excursions = st.session_state.get('excursions')
+        if excursions is None:
+            st.info("Excursion summary is not available for this job. Please run the analysis again.")
+        elif len(excursions) == 0:
+            st.success("✅ No excursions above 25 C or outside 35-65 %RH, and no rapid changes detected")
+        else:
+            st.dataframe(excursions, use_container_width=True)
+        
         # Display AI analysis
         st.subheader("AI Analysis Report")
         st.markdown(st.session_state.ai_analysis)
@@ -367,6 +572,51 @@ with tab3:
                 "📈 Download Processed CSV Data"
             ), unsafe_allow_html=True)
 
+# Tab 4: Live Monitoring
+with tab4:
+    st.header("Live Monitoring")
+    st.markdown("Watch sensors while a mapping study is running. Only new rows are read on each update.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        live_source_type = st.radio("Data source:", ["Current-day CSV in data/csv", "Local socket"], horizontal=True)
+        live_port = st.number_input("Socket port:", min_value=1024, max_value=65535, value=9009,
+                                    disabled=live_source_type != "Local socket")
+    with col2:
+        live_start_sensor = st.number_input("Start sensor:", min_value=1, value=1)
+        live_end_sensor = st.number_input("End sensor:", min_value=1, value=10)
+        live_chart_minutes = st.number_input("Chart window (minutes):", min_value=10, value=360, step=10)
+    
+    live_enabled = st.toggle("Follow live data")
+    
+    if not live_enabled:
+        st.session_state.live_store = None
+        st.session_state.live_source = None
+        st.session_state.live_source_key = None
+    else:
+        # Rebuild the source and store whenever the source type or port changes
+        live_source_key = (live_source_type, int(live_port) if live_source_type == "Local socket" else None)
+        if st.session_state.live_store is None or st.session_state.live_source_key != live_source_key:
+            st.session_state.live_store = None
+            st.session_state.live_source = None
+            st.session_state.live_source_key = live_source_key
+            try:
+                if live_source_type == "Local socket":
+                    st.session_state.live_source = get_socket_feed(int(live_port)).subscribe()
+                else:
+                    st.session_state.live_source = CsvTailer("data/csv", from_start=True)
+                st.session_state.live_store = LiveStore()
+            except Exception as e:
+                st.error(f"❌ Error starting live source: {str(e)}")
+        
+        if st.session_state.live_store is not None:
+            live_sensors = range(int(live_start_sensor), int(max(live_start_sensor, live_end_sensor)) + 1)
+            show_live_updates(
+                [f"TempSensor{i}" for i in live_sensors],
+                [f"RHSensor{i}" for i in live_sensors],
+                int(live_chart_minutes)
+            )
+
 # Add footer
 st.markdown("---")
 st.markdown("**Temperature & Humidity Mapping Analysis Tool** | Built with Streamlit")
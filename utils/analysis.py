@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
-import google.generativeai as genai
 import os
 
+from utils.data_processor import filter_data_by_time_and_sensors, check_data_loss, vtn_imputation
+
 def calculate_statistics(filled_data, sensor_columns_temp, sensor_columns_humidity):
     """คำนวณค่าสถิติของข้อมูลอุณหภูมิและความชื้น"""
     # เลือกคอลัมน์ที่มีอยู่ในข้อมูล
@@ -21,6 +22,62 @@ def calculate_statistics(filled_data, sensor_columns_temp, sensor_columns_humidi
     
     return temp_stats, humidity_stats
 
+def analyze_room(all_data, room, on_step=None):
+    """
+    วิเคราะห์หนึ่งห้อง: กรองข้อมูล ตรวจสอบข้อมูลขาดหาย เติมข้อมูล และคำนวณสถิติ
+
+    ใช้ร่วมกันระหว่างการวิเคราะห์ห้องเดียว (job) และรายงานรวมของ study เพื่อให้ผลลัพธ์ตรงกัน
+
+    Parameters:
+    all_data (DataFrame): ข้อมูลเซ็นเซอร์ทั้งหมด
+    room (dict): start_time, end_time, start_sensor, end_sensor, additional_sensors, exclude_sensors
+    on_step (callable): ฟังก์ชันที่ถูกเรียกเมื่อเริ่มแต่ละขั้นตอน on_step(step_name)
+
+    Returns:
+    dict: selected_data, filled_data, sensor_columns_temp, sensor_columns_humidity (เฉพาะคอลัมน์ที่มีในข้อมูล),
+          data_loss_results, data_loss_warnings, temp_stats, humidity_stats
+    """
+    def report(step_name):
+        if on_step:
+            on_step(step_name)
+
+    report("Filter data")
+    selected_data, sensor_columns_temp, sensor_columns_humidity = filter_data_by_time_and_sensors(
+        all_data,
+        room['start_time'],
+        room['end_time'],
+        room['start_sensor'],
+        room['end_sensor'],
+        room.get('additional_sensors'),
+        room.get('exclude_sensors')
+    )
+    if len(selected_data) == 0:
+        raise ValueError("No data found for the selected time period.")
+
+    report("Check data loss")
+    data_loss_results, data_loss_warnings = check_data_loss(selected_data, room['start_sensor'])
+
+    report("Fill missing data")
+    filled_data = vtn_imputation(selected_data, sensor_columns_temp, sensor_columns_humidity)
+
+    # ใช้เฉพาะเซ็นเซอร์ที่มีคอลัมน์อยู่ในข้อมูลจริง
+    sensor_columns_temp = [col for col in sensor_columns_temp if col in filled_data.columns]
+    sensor_columns_humidity = [col for col in sensor_columns_humidity if col in filled_data.columns]
+
+    report("Calculate statistics")
+    temp_stats, humidity_stats = calculate_statistics(filled_data, sensor_columns_temp, sensor_columns_humidity)
+
+    return {
+        'selected_data': selected_data,
+        'filled_data': filled_data,
+        'sensor_columns_temp': sensor_columns_temp,
+        'sensor_columns_humidity': sensor_columns_humidity,
+        'data_loss_results': data_loss_results,
+        'data_loss_warnings': data_loss_warnings,
+        'temp_stats': temp_stats,
+        'humidity_stats': humidity_stats,
+    }
+
 def get_ai_analysis(temp_stats, humidity_stats, room_number, room_name, api_key=None):
     """วิเคราะห์ด้วย AI"""
     if not api_key:
@@ -39,6 +96,8 @@ The overall temperature conditions show variation across the mapped area, with t
         return default_text
     
     try:
+        # โหลด Gemini SDK เมื่อใช้งานจริงเท่านั้น เพื่อลดเวลาเริ่มต้นของแอป
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel("gemini-1.5-flash")
         
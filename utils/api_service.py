@@ -0,0 +1,352 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import process_csv_files
+from utils.data_catalog import refresh_catalog
+from utils.mapping_plan import load_mapping_plan
+from utils.events import build_event_index
+from utils.job_scheduler import JobScheduler, JOB_DONE, JOB_FAILED, JOB_KIND_STUDY_REPORT
+
+
+class NotFoundError(LookupError):
+    """ไม่พบห้องหรืองานที่ร้องขอ (ตอบกลับเป็น HTTP 404)"""
+
+
+def _to_json_value(value):
+    """แปลงค่าจาก pandas/numpy ให้อยู่ในรูปที่ส่งเป็น JSON ได้"""
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient="index", date_format="iso"))
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+    if isinstance(value, (np.integer, np.floating)):
+        return None if pd.isna(value) else value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(item) for item in value]
+    return value
+
+
+class AnalysisService:
+    """
+    ชั้นบริการสำหรับการวิเคราะห์ ที่เก็บข้อมูลและ cache ไว้ใน process เดียวตลอดอายุการทำงาน
+
+    - ข้อมูล CSV ถูก ingest ใหม่เฉพาะเมื่อ checksum ของไฟล์ใน catalog เปลี่ยน
+    - แผนแมพปิ้งถูก compile ครั้งเดียวต่อ checksum (load_mapping_plan)
+    - งานวิเคราะห์รันผ่าน JobScheduler ร่วมกันทุก client (HTTP, CLI และ Streamlit)
+    """
+
+    def __init__(self, csv_dir="data/csv", excel_dir="data/excel", export_dir="data/reports", max_workers=2):
+        self.csv_dir = csv_dir
+        self.excel_dir = excel_dir
+        self.scheduler = JobScheduler(max_workers=max_workers, export_dir=export_dir)
+        self._lock = threading.Lock()
+        self._data_signature = None
+        self._all_data = None
+        self._events = None
+
+    def load_data(self):
+        """คืนค่าข้อมูลที่ ingest แล้วและตาราง event (ingest ใหม่เมื่อไฟล์เปลี่ยนเท่านั้น)"""
+        with self._lock:
+            # ข้ามไฟล์ที่อ่านไม่ได้ (มี error ใน catalog)
+            catalog = [entry for entry in refresh_catalog(self.csv_dir, ".csv") if not entry.get('error')]
+            signature = tuple((entry['path'], entry['checksum']) for entry in catalog)
+            if signature != self._data_signature:
+                if not catalog:
+                    raise ValueError(f"No CSV files found in {self.csv_dir}")
+                self._all_data = process_csv_files([entry['path'] for entry in catalog])
+                self._events = build_event_index(self._all_data)
+                self._data_signature = signature
+            return self._all_data, self._events
+
+    def load_plan(self, plan_path=None):
+        """โหลดแผนแมพปิ้ง (ใช้ไฟล์ .xlsx ไฟล์แรกใน excel_dir หากไม่ระบุ)"""
+        if plan_path is None:
+            plans = refresh_catalog(self.excel_dir, ".xlsx")
+            if not plans:
+                raise ValueError(f"No mapping plan found in {self.excel_dir}")
+            plan_path = plans[0]['path']
+        return load_mapping_plan(plan_path)
+
+    def list_rooms(self, plan_path=None):
+        """รายการห้องในแผนแมพปิ้ง"""
+        plan = self.load_plan(plan_path)
+        return [
+            {
+                'room_index': entry.index,
+                'room_number': entry.room_number,
+                'room_name': entry.room_name,
+                'start_time': entry.start_time,
+                'end_time': entry.end_time,
+                'start_sensor': entry.start_sensor,
+                'end_sensor': entry.end_sensor,
+                'scheduled': entry.is_scheduled,
+            }
+            for entry in plan.room_options()
+        ]
+
+    def _find_entry(self, plan, request):
+        if request.get('room_index') is not None:
+            try:
+                entry = plan.get_entry(int(request['room_index']))
+            except KeyError:
+                raise NotFoundError(f"Room index not found in mapping plan: {request['room_index']}")
+            if not entry.is_valid:
+                raise ValueError(f"Room {entry.room_number} has invalid entries in the mapping plan")
+            return entry
+        room_number = str(request.get('room_number', "")).strip()
+        for entry in plan.room_options():
+            if str(entry.room_number).strip() == room_number:
+                return entry
+        raise NotFoundError(f"Room not found in mapping plan: {room_number}")
+
+    def build_params(self, request):
+        """แปลงคำขอ (ห้อง, ช่วงเวลา, เซ็นเซอร์ที่เพิ่ม/ตัดออก) เป็นพารามิเตอร์ของงานวิเคราะห์"""
+        entry = self._find_entry(self.load_plan(request.get('plan_path')), request)
+        params = {
+            'room_number': entry.room_number,
+            'room_name': entry.room_name,
+            'start_time': pd.to_datetime(request.get('start_time') or entry.start_time),
+            'end_time': pd.to_datetime(request.get('end_time') or entry.end_time),
+            'start_sensor': int(request.get('start_sensor') or entry.start_sensor),
+            'end_sensor': int(request.get('end_sensor') or entry.end_sensor),
+            'additional_sensors': [int(x) for x in request.get('additional_sensors') or []],
+            'exclude_sensors': [int(x) for x in request.get('exclude_sensors') or []],
+            'api_key': request.get('api_key'),
+        }
+        if pd.isna(params['start_time']) or pd.isna(params['end_time']):
+            raise ValueError(f"Room {entry.room_number} has no start/end time in the mapping plan")
+        return params
+
+    def submit_analysis(self, params, all_data=None, events=None):
+        """
+        ส่งงานวิเคราะห์ห้องเข้าคิว (ใช้ข้อมูลที่ ingest ไว้ของ service หากไม่ระบุ all_data)
+
+        events ต้องเป็นตาราง event ของ all_data ชุดเดียวกัน งานจะใช้สรุป excursion โดยไม่ต้องสแกนข้อมูลใหม่
+        """
+        if all_data is None:
+            all_data, events = self.load_data()
+        return self.scheduler.submit(all_data, params, events)
+
+    def submit_study_report(self, include_series=False, plan_path=None, all_data=None, plan=None):
+        """ส่งงานสร้างรายงานรวมของทุกห้องที่มีกำหนดการในแผนเข้าคิว"""
+        if all_data is None:
+            all_data, _ = self.load_data()
+        if plan is None:
+            plan = self.load_plan(plan_path)
+        rooms = [
+            {
+                'room_number': entry.room_number,
+                'room_name': entry.room_name,
+                'start_time': entry.start_time,
+                'end_time': entry.end_time,
+                'start_sensor': entry.start_sensor,
+                'end_sensor': entry.end_sensor,
+            }
+            for entry in plan.scheduled_entries()
+        ]
+        return self.scheduler.submit_study_report(all_data, rooms, include_series)
+
+    def get_job(self, job_id):
+        return self.scheduler.get_job(job_id)
+
+    def wait_for_job(self, job_id, timeout=None, poll_interval=0.5):
+        """รอจนกว่างานจะเสร็จ (หรือหมดเวลา) แล้วคืนค่า job"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        job = self.get_job(job_id)
+        while job is not None and not job.is_finished:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(poll_interval)
+            job = self.get_job(job_id)
+        return job
+
+    def job_to_dict(self, job):
+        """สรุปสถานะและผลลัพธ์ของงานเป็น dict ที่ส่งเป็น JSON ได้"""
+        response = {
+            'job_id': job.job_id,
+            'kind': job.kind,
+            'status': job.status,
+            'step': job.step,
+            'total_steps': job.total_steps,
+            'step_name': job.step_name,
+            'error': job.error,
+        }
+        if job.status != JOB_DONE or job.result is None:
+            return _to_json_value(response)
+
+        result = job.result
+        if job.kind == JOB_KIND_STUDY_REPORT:
+            response['result'] = result
+            return _to_json_value(response)
+
+        response['result'] = {
+            'room_number': result['room_number'],
+            'room_name': result['room_name'],
+            'data_points': result['data_points'],
+            'temp_stats': result['temp_stats'],
+            'humidity_stats': result['humidity_stats'],
+            'data_loss_warnings': result['data_loss_warnings'],
+            'data_loss_results': result['data_loss_results'],
+            'ai_analysis': result['ai_analysis'],
+            'export_path': result['export_path'],
+            'csv_export_path': result['csv_export_path'],
+        }
+        # excursion คำนวณในงานจากข้อมูลที่งานใช้จริง (งานเก่าที่ไม่มีผลนี้จะไม่ส่งค่านี้)
+        if result.get('excursions') is not None:
+            response['result']['excursions'] = result['excursions'].to_dict(orient="records")
+        return _to_json_value(response)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler ของ AnalysisService (JSON เข้า/ออก)"""
+
+    service = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _handle(self, handler):
+        try:
+            status, payload = handler()
+        except NotFoundError as e:
+            status, payload = 404, {'error': str(e)}
+        except (ValueError, TypeError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': str(e)}
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            self._handle(lambda: (200, {'status': "ok"}))
+        elif path == "/rooms":
+            self._handle(lambda: (200, _to_json_value(self.service.list_rooms())))
+        elif path.startswith("/jobs/"):
+            self._handle(lambda: self._get_job(path[len("/jobs/"):]))
+        else:
+            self._send_json(404, {'error': f"Unknown path: {path}"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/analyze":
+            self._handle(self._post_analyze)
+        elif path == "/study-report":
+            self._handle(self._post_study_report)
+        else:
+            self._send_json(404, {'error': f"Unknown path: {path}"})
+
+    def _get_job(self, job_id):
+        job = self.service.get_job(job_id)
+        if job is None:
+            raise NotFoundError(f"Job not found: {job_id}")
+        return 200, self.service.job_to_dict(job)
+
+    def _respond_with_job(self, job_id, request):
+        if request.get('wait'):
+            job = self.service.wait_for_job(job_id, timeout=request.get('timeout'))
+            return (200 if job.is_finished else 202), self.service.job_to_dict(job)
+        return 202, {'job_id': job_id, 'status_url': f"/jobs/{job_id}"}
+
+    def _post_analyze(self):
+        request = self._read_json()
+        job_id = self.service.submit_analysis(self.service.build_params(request))
+        return self._respond_with_job(job_id, request)
+
+    def _post_study_report(self):
+        request = self._read_json()
+        job_id = self.service.submit_study_report(bool(request.get('include_series')), request.get('plan_path'))
+        return self._respond_with_job(job_id, request)
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[api] {self.address_string()} {format % args}\n")
+
+
+def serve(service, host="127.0.0.1", port=8502):
+    """เริ่ม HTTP server (รองรับหลายคำขอพร้อมกันด้วย thread ต่อคำขอ)"""
+    handler = type("RequestHandler", (_RequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Analysis service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.scheduler.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless temperature mapping analysis service")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the HTTP API")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8502)
+    serve_parser.add_argument("--workers", type=int, default=2)
+
+    subparsers.add_parser("rooms", help="List rooms in the mapping plan")
+
+    analyze_parser = subparsers.add_parser("analyze", help="Analyze one room and print the result as JSON")
+    analyze_parser.add_argument("room_number")
+    analyze_parser.add_argument("--start-time")
+    analyze_parser.add_argument("--end-time")
+    analyze_parser.add_argument("--add", type=int, nargs="*", default=[], help="Additional sensors")
+    analyze_parser.add_argument("--exclude", type=int, nargs="*", default=[], help="Excluded sensors")
+
+    report_parser = subparsers.add_parser("study-report", help="Write the consolidated report for all scheduled rooms")
+    report_parser.add_argument("--include-series", action="store_true")
+
+    args = parser.parse_args(argv)
+    service = AnalysisService(max_workers=getattr(args, "workers", 2))
+
+    if args.command == "serve":
+        serve(service, args.host, args.port)
+        return
+
+    if args.command == "rooms":
+        output = _to_json_value(service.list_rooms())
+    elif args.command == "analyze":
+        job_id = service.submit_analysis(service.build_params({
+            'room_number': args.room_number,
+            'start_time': args.start_time,
+            'end_time': args.end_time,
+            'additional_sensors': args.add,
+            'exclude_sensors': args.exclude,
+        }))
+        output = service.job_to_dict(service.wait_for_job(job_id))
+    else:
+        job_id = service.submit_study_report(args.include_series)
+        output = service.job_to_dict(service.wait_for_job(job_id))
+
+    print(json.dumps(output, ensure_ascii=False, indent=2, default=str))
+    service.scheduler.shutdown()
+    if isinstance(output, dict) and output.get('status') == JOB_FAILED:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import pandas as pd
+
+DEFAULT_CATALOG_PATH = os.path.join("data", "catalog.json")
+CATALOG_VERSION = 1
+
+_catalog_lock = threading.Lock()
+
+
+def file_checksum(file_path, chunk_size=1024 * 1024):
+    """คำนวณ SHA-1 checksum ของไฟล์แบบอ่านทีละ chunk"""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _describe_csv_file(file_path):
+    """อ่านเฉพาะ header และคอลัมน์ timestamp เพื่อสรุปข้อมูลของไฟล์ CSV"""
+    columns = pd.read_csv(file_path, nrows=0).columns
+    sensors = sorted(int(col.replace("TempSensor", "")) for col in columns if col.startswith("TempSensor"))
+
+    timestamps = pd.read_csv(file_path, usecols=['timestamp'], on_bad_lines='skip')['timestamp']
+    timestamps = pd.to_datetime(timestamps, format='mixed', errors='coerce').dropna()
+
+    return {
+        'row_count': int(len(timestamps)),
+        'start_time': timestamps.min().isoformat() if len(timestamps) else None,
+        'end_time': timestamps.max().isoformat() if len(timestamps) else None,
+        'sensors': sensors,
+    }
+
+
+def _describe_file(file_path, stat):
+    """สร้างรายการ catalog ของไฟล์หนึ่งไฟล์"""
+    entry = {
+        'path': file_path,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'checksum': file_checksum(file_path),
+    }
+    if file_path.endswith(".csv"):
+        # ไฟล์ที่อ่านไม่ได้ (เช่น ไม่มีคอลัมน์ timestamp) ยังคงอยู่ใน catalog พร้อมข้อความ error
+        try:
+            entry.update(_describe_csv_file(file_path))
+        except Exception as e:
+            entry.update({'row_count': None, 'start_time': None, 'end_time': None, 'sensors': [], 'error': str(e)})
+    return entry
+
+
+def load_catalog(catalog_path=DEFAULT_CATALOG_PATH):
+    """โหลด catalog จากไฟล์ JSON (คืนค่า catalog ว่างหากไม่มีไฟล์หรือไฟล์เสีย)"""
+    if os.path.exists(catalog_path):
+        try:
+            with open(catalog_path, "r", encoding="utf-8") as f:
+                catalog = json.load(f)
+            if catalog.get('version') == CATALOG_VERSION:
+                return catalog
+        except (OSError, ValueError):
+            pass
+    return {'version': CATALOG_VERSION, 'files': {}}
+
+
+def save_catalog(catalog, catalog_path=DEFAULT_CATALOG_PATH):
+    """
+    บันทึก catalog แบบ atomic (เขียนไฟล์ชั่วคราวแล้วแทนที่)
+
+    ไฟล์ชั่วคราวมีชื่อไม่ซ้ำกัน เพราะแอป Streamlit และ API service อาจบันทึก catalog เดียวกันพร้อมกัน
+    """
+    directory = os.path.dirname(catalog_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory or ".", prefix=".catalog-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, catalog_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def refresh_catalog(directory, file_extension, catalog_path=DEFAULT_CATALOG_PATH):
+    """
+    อัปเดต catalog ของไฟล์ในโฟลเดอร์ และคืนค่ารายการไฟล์เรียงตามชื่อ
+
+    อ่านเนื้อหาไฟล์ใหม่เฉพาะไฟล์ที่ขนาดหรือ mtime เปลี่ยนไปเท่านั้น
+    ไฟล์ที่ไม่เปลี่ยนจะใช้ข้อมูลเดิมจาก catalog
+
+    Parameters:
+    directory (str): โฟลเดอร์ที่ต้องการสแกน
+    file_extension (str): นามสกุลไฟล์ เช่น ".csv"
+    catalog_path (str): ตำแหน่งไฟล์ catalog
+
+    Returns:
+    list: รายการ dict ของแต่ละไฟล์ (path, size, mtime_ns, checksum และสำหรับ CSV:
+          row_count, start_time, end_time, sensors และ error หากอ่านไฟล์ไม่ได้)
+    """
+    with _catalog_lock:
+        catalog = load_catalog(catalog_path)
+        files = catalog['files']
+        changed = False
+
+        current_paths = set()
+        if os.path.exists(directory):
+            with os.scandir(directory) as it:
+                for item in it:
+                    if not item.is_file() or not item.name.endswith(file_extension):
+                        continue
+                    file_path = os.path.join(directory, item.name)
+                    current_paths.add(file_path)
+                    stat = item.stat()
+
+                    entry = files.get(file_path)
+                    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                        continue
+                    files[file_path] = _describe_file(file_path, stat)
+                    changed = True
+
+        # ลบรายการของไฟล์ที่ถูกลบออกจากโฟลเดอร์แล้ว
+        prefix = os.path.join(directory, "")
+        for file_path in list(files):
+            if file_path.startswith(prefix) and file_path.endswith(file_extension) and file_path not in current_paths:
+                del files[file_path]
+                changed = True
+
+        if changed:
+            save_catalog(catalog, catalog_path)
+
+    return [files[file_path] for file_path in sorted(current_paths)]
+
+
+def select_files_for_window(entries, start_time, end_time):
+    """เลือกเฉพาะไฟล์ที่ช่วงเวลาของข้อมูลทับซ้อนกับช่วง start_time ถึง end_time"""
+    start_time = pd.to_datetime(start_time)
+    end_time = pd.to_datetime(end_time)
+    selected = []
+    for entry in entries:
+        if not entry.get('start_time') or not entry.get('end_time'):
+            continue
+        if pd.to_datetime(entry['start_time']) <= end_time and pd.to_datetime(entry['end_time']) >= start_time:
+            selected.append(entry['path'])
+    return selected
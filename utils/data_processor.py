@@ -4,6 +4,8 @@ import numpy as np
 from datetime import datetime
 import streamlit as st
 
+from utils.mapping_plan import load_mapping_plan
+
 def find_csv_files(directory):
     """ค้นหาไฟล์ CSV ในโฟลเดอร์ที่ระบุ"""
     csv_files = []
@@ -26,29 +28,8 @@ def process_csv_files(csv_files):
     return all_data
 
 def parse_excel_file(excel_file_path):
-    """อ่านไฟล์ Excel และแปลงข้อมูลวันเวลา"""
-    try:
-        index_df = pd.read_excel(excel_file_path, sheet_name="Report")
-        
-        # ตรวจสอบคอลัมน์ที่จำเป็น
-        required_columns = ['Start date', 'End date', 'Time', 'room number', 'room name', 'Sensor start', 'Sensor stop']
-        if not all(col in index_df.columns for col in required_columns):
-            missing_cols = [col for col in required_columns if col not in index_df.columns]
-            raise ValueError(f"Missing columns in Excel file: {missing_cols}")
-        
-        # แปลงวันเวลา
-        index_df['start_time'] = pd.to_datetime(
-            index_df['Start date'].astype(str) + ' ' + index_df['Time'].astype(str),
-            errors='coerce'
-        )
-        index_df['end_time'] = pd.to_datetime(
-            index_df['End date'].astype(str) + ' ' + index_df['Time'].astype(str),
-            errors='coerce'
-        )
-        
-        return index_df
-    except Exception as e:
-        raise Exception(f"Error parsing Excel file: {str(e)}")
+    """อ่านไฟล์ Excel และแปลงข้อมูลวันเวลา (ผ่านแผนแมพปิ้งที่ compile แล้ว)"""
+    return load_mapping_plan(excel_file_path).to_dataframe()
 
 def filter_data_by_time_and_sensors(all_data, start_time, end_time, start_sensor, end_sensor, additional_sensors=None, exclude_sensors=None):
     """กรองข้อมูลตามช่วงเวลาและเซ็นเซอร์ที่ระบุ"""
@@ -295,8 +276,12 @@ def _calculate_sensor_deltas(reference_data, target_col, neighbor_cols):
     return deltas
 
 @st.cache_data
-def process_csv_files_cached(csv_files):
-    """รวมข้อมูลจากไฟล์ CSV หลายไฟล์ พร้อมการ cache"""
+def process_csv_files_cached(csv_files, file_checksums=None):
+    """
+    รวมข้อมูลจากไฟล์ CSV หลายไฟล์ พร้อมการ cache
+    
+    file_checksums ใช้เป็นส่วนหนึ่งของ cache key เท่านั้น เพื่อให้อ่านไฟล์ใหม่เมื่อเนื้อหาไฟล์เปลี่ยน
+    """
     all_data = pd.DataFrame()
     for file in csv_files:
         df = pd.read_csv(file, on_bad_lines='skip')
@@ -307,31 +292,13 @@ def process_csv_files_cached(csv_files):
     all_data = all_data.sort_values(by='timestamp').reset_index(drop=True)
     return all_data
 
-@st.cache_data
 def parse_excel_file_cached(excel_file_path):
-    """อ่านไฟล์ Excel และแปลงข้อมูลวันเวลา พร้อมการ cache"""
-    try:
-        index_df = pd.read_excel(excel_file_path, sheet_name="Report")
-        
-        # ตรวจสอบคอลัมน์ที่จำเป็น
-        required_columns = ['Start date', 'End date', 'Time', 'room number', 'room name', 'Sensor start', 'Sensor stop']
-        if not all(col in index_df.columns for col in required_columns):
-            missing_cols = [col for col in required_columns if col not in index_df.columns]
-            raise ValueError(f"Missing columns in Excel file: {missing_cols}")
-        
-        # แปลงวันเวลา
-        index_df['start_time'] = pd.to_datetime(
-            index_df['Start date'].astype(str) + ' ' + index_df['Time'].astype(str),
-            errors='coerce'
-        )
-        index_df['end_time'] = pd.to_datetime(
-            index_df['End date'].astype(str) + ' ' + index_df['Time'].astype(str),
-            errors='coerce'
-        )
-        
-        return index_df
-    except Exception as e:
-        raise Exception(f"Error parsing Excel file: {str(e)}")
+    """
+    อ่านไฟล์ Excel และแปลงข้อมูลวันเวลา พร้อมการ cache
+    
+    แผนแมพปิ้งถูก cache ตาม checksum ของไฟล์ใน load_mapping_plan แล้ว
+    """
+    return parse_excel_file(excel_file_path)
 
 def list_existing_files(directory, file_extension):
     """ดึงรายการไฟล์ที่มีอยู่ในระบบตามนามสกุลไฟล์ที่กำหนด"""
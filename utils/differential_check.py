@@ -0,0 +1,259 @@
+import re
+import sys
+import time
+import argparse
+import warnings
+import importlib
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import check_data_loss, vtn_imputation
+from utils.analysis import calculate_statistics
+
+# ฟังก์ชันอ้างอิง (ผลลัพธ์ที่ใช้ในรายงาน validation ปัจจุบัน)
+REFERENCE_ENGINES = {
+    'vtn_imputation': vtn_imputation,
+    'check_data_loss': check_data_loss,
+    'calculate_statistics': calculate_statistics,
+}
+
+# engine ที่ต้องการเปรียบเทียบกับฟังก์ชันอ้างอิง: ชื่อฟังก์ชัน -> {ชื่อ engine: ฟังก์ชัน}
+CANDIDATE_ENGINES = {name: {} for name in REFERENCE_ENGINES}
+
+# ขนาดข้อมูลสุ่ม: small เน้นกรณีขอบ, study ใกล้เคียงข้อมูลจริงของการศึกษา (หลายพันแถว, 30-50 เซ็นเซอร์)
+SIZE_TIERS = {
+    'small': {'min_rows': 20, 'max_rows': 240, 'min_sensors': 2, 'max_sensors': 6},
+    'study': {'min_rows': 5000, 'max_rows': 15000, 'min_sensors': 28, 'max_sensors': 56},
+}
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def register_engine(function_name, engine_name, engine):
+    """ลงทะเบียน engine ที่ต้องการเปรียบเทียบกับฟังก์ชันอ้างอิง function_name"""
+    if function_name not in REFERENCE_ENGINES:
+        raise ValueError(f"Unknown reference function: {function_name}")
+    CANDIDATE_ENGINES[function_name][engine_name] = engine
+
+
+def generate_sensor_frame(rng, max_rows=240, max_sensors=6, min_rows=20, min_sensors=2):
+    """
+    สุ่มสร้างข้อมูลเซ็นเซอร์สำหรับทดสอบ ที่มีกรณียากครบ
+
+    - timestamp ไม่สม่ำเสมอ (jitter และช่วงขาดหายเกิน 120 วินาที)
+    - ค่า 0 ต่อเนื่องกัน (ข้อมูลขาดหาย) และค่า NaN
+    - คอลัมน์ของเซ็นเซอร์บางตัวหายไปจากข้อมูล
+
+    Returns:
+    tuple: (DataFrame, temp_cols, humidity_cols, start_sensor) ในรูปแบบเดียวกับผลลัพธ์ของ filter_data_by_time_and_sensors
+    """
+    n_rows = int(rng.integers(min_rows, max_rows + 1))
+    start_sensor = int(rng.integers(1, 40))
+    sensors = list(range(start_sensor, start_sensor + int(rng.integers(min_sensors, max_sensors + 1))))
+
+    # timestamp ห่างกันประมาณ 60 วินาที พร้อม jitter และช่วงที่ขาดหายเป็นบางครั้ง
+    steps = 60 + rng.integers(-5, 6, size=n_rows)
+    steps[rng.random(n_rows) < 0.03] += int(rng.integers(121, 1800))
+    timestamps = pd.Timestamp("2025-04-08 16:30:00") + pd.to_timedelta(np.cumsum(steps) - steps[0], unit="s")
+
+    data = {'timestamp': timestamps}
+    base_temp = 21 + rng.normal(0, 1.5)
+    base_rh = 50 + rng.normal(0, 8)
+    drift = np.cumsum(rng.normal(0, 0.05, size=n_rows))
+    for sensor in sensors:
+        data[f"TempSensor{sensor}"] = np.round(base_temp + rng.normal(0, 0.5) + drift + rng.normal(0, 0.1, n_rows), 2)
+        data[f"RHSensor{sensor}"] = np.round(base_rh + rng.normal(0, 3) - 2 * drift + rng.normal(0, 0.5, n_rows), 2)
+    df = pd.DataFrame(data)
+
+    sensor_cols = [col for col in df.columns if col != 'timestamp']
+    for col in sensor_cols:
+        # ช่วงค่า 0 ต่อเนื่อง
+        for _ in range(int(rng.integers(0, 3))):
+            start = int(rng.integers(0, n_rows))
+            df.loc[start:start + int(rng.integers(1, max(2, n_rows // 4))), col] = 0.0
+        # ค่า NaN แบบกระจาย
+        df.loc[rng.random(n_rows) < 0.02, col] = np.nan
+    # บางครั้งให้เซ็นเซอร์ทั้งคอลัมน์เป็น 0
+    if rng.random() < 0.2:
+        df[sensor_cols[int(rng.integers(0, len(sensor_cols)))]] = 0.0
+
+    temp_cols = [f"TempSensor{sensor}" for sensor in sensors]
+    humidity_cols = [f"RHSensor{sensor}" for sensor in sensors]
+
+    # คอลัมน์ที่หายไปจากข้อมูล (แต่ยังอยู่ในรายชื่อเซ็นเซอร์)
+    if rng.random() < 0.3:
+        df = df.drop(columns=[str(rng.choice(sensor_cols[1:]))])
+
+    return df, temp_cols, humidity_cols, start_sensor
+
+
+def _case_arguments(function_name, df, temp_cols, humidity_cols, start_sensor):
+    """เตรียม argument ของแต่ละฟังก์ชันจากข้อมูลที่สุ่มได้"""
+    if function_name == 'vtn_imputation':
+        return (df, temp_cols, humidity_cols)
+    if function_name == 'check_data_loss':
+        return (df, start_sensor)
+    # calculate_statistics ใช้ข้อมูลที่เติมค่าแล้ว และเฉพาะคอลัมน์ที่มีอยู่จริง
+    filled = vtn_imputation(df, temp_cols, humidity_cols)
+    return (
+        filled,
+        [col for col in temp_cols if col in filled.columns],
+        [col for col in humidity_cols if col in filled.columns],
+    )
+
+
+def _compare_lines(expected, actual, rtol, atol):
+    """เปรียบเทียบรายการข้อความ โดยตัวเลขในข้อความเทียบแบบมี tolerance"""
+    if len(expected) != len(actual):
+        return f"expected {len(expected)} lines, got {len(actual)}"
+    for i, (exp_line, act_line) in enumerate(zip(expected, actual)):
+        if _NUMBER.sub("#", exp_line) != _NUMBER.sub("#", act_line):
+            return f"line {i} differs: {exp_line!r} != {act_line!r}"
+        exp_numbers = np.array(_NUMBER.findall(exp_line), dtype=float)
+        act_numbers = np.array(_NUMBER.findall(act_line), dtype=float)
+        if not np.allclose(exp_numbers, act_numbers, rtol=rtol, atol=atol):
+            return f"line {i} numbers differ: {exp_line!r} != {act_line!r}"
+    return None
+
+
+def compare_outputs(expected, actual, rtol=1e-9, atol=1e-6):
+    """เปรียบเทียบผลลัพธ์ของสอง engine (คืนค่า None หากเท่ากันภายใน tolerance หรือข้อความที่อธิบายความต่าง)"""
+    if isinstance(expected, tuple):
+        if not isinstance(actual, tuple) or len(expected) != len(actual):
+            return f"expected a tuple of {len(expected)} items"
+        for i, (exp_item, act_item) in enumerate(zip(expected, actual)):
+            difference = compare_outputs(exp_item, act_item, rtol, atol)
+            if difference:
+                return f"item {i}: {difference}"
+        return None
+    if isinstance(expected, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=rtol, atol=atol, check_dtype=False)
+        except AssertionError as e:
+            return str(e).splitlines()[0] if str(e) else "DataFrames differ"
+        return None
+    if isinstance(expected, list):
+        return _compare_lines(expected, actual, rtol, atol)
+    return None if expected == actual else f"{expected!r} != {actual!r}"
+
+
+def _run(engine, arguments):
+    """รัน engine และจับเวลา (คืนค่า ผลลัพธ์, exception, เวลาเป็นวินาที)"""
+    # ส่งสำเนาเพื่อไม่ให้ engine หนึ่งแก้ไขข้อมูลที่อีก engine ใช้
+    arguments = tuple(arg.copy() if isinstance(arg, (pd.DataFrame, list)) else arg for arg in arguments)
+    start = time.perf_counter()
+    try:
+        return engine(*arguments), None, time.perf_counter() - start
+    except Exception as e:
+        return None, e, time.perf_counter() - start
+
+
+def run_differential(cases=50, seed=0, functions=None, rtol=1e-9, atol=1e-6, size=None):
+    """
+    รันฟังก์ชันอ้างอิงและ engine ที่ลงทะเบียนไว้กับข้อมูลสุ่ม แล้วเปรียบเทียบผลลัพธ์
+
+    หากฟังก์ชันอ้างอิงเกิด exception engine ต้องเกิด exception ประเภทเดียวกัน
+    หากไม่มี engine ที่ลงทะเบียนไว้ จะรันฟังก์ชันอ้างอิงซ้ำเพื่อตรวจสอบว่าผลลัพธ์คงที่
+    size คือ argument ของ generate_sensor_frame (ค่าเริ่มต้น SIZE_TIERS['small'])
+    speedup เป็น NaN เมื่อ engine เกิด exception หรือผลลัพธ์ไม่เท่ากับฟังก์ชันอ้างอิง
+
+    Returns:
+    DataFrame: หนึ่งแถวต่อ (case, ฟังก์ชัน, engine) พร้อมผลการเปรียบเทียบ เวลา และ speedup
+    """
+    rng = np.random.default_rng(seed)
+    records = []
+    functions = functions or list(REFERENCE_ENGINES)
+    size = size or SIZE_TIERS['small']
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for case in range(cases):
+            df, temp_cols, humidity_cols, start_sensor = generate_sensor_frame(rng, **size)
+            for function_name in functions:
+                arguments = _case_arguments(function_name, df, temp_cols, humidity_cols, start_sensor)
+                expected, expected_error, reference_seconds = _run(REFERENCE_ENGINES[function_name], arguments)
+
+                engines = CANDIDATE_ENGINES[function_name] or {'reference (repeat)': REFERENCE_ENGINES[function_name]}
+                for engine_name, engine in engines.items():
+                    actual, actual_error, engine_seconds = _run(engine, arguments)
+                    if expected_error is not None or actual_error is not None:
+                        same_error = type(expected_error) is type(actual_error)
+                        difference = None if same_error else f"reference raised {expected_error!r}, engine raised {actual_error!r}"
+                    else:
+                        difference = compare_outputs(expected, actual, rtol, atol)
+                    timed = difference is None and actual_error is None and engine_seconds > 0
+
+                    records.append({
+                        'case': case,
+                        'function': function_name,
+                        'engine': engine_name,
+                        'rows': len(df),
+                        'sensors': len(temp_cols),
+                        'equivalent': difference is None,
+                        'difference': difference,
+                        'reference_ms': reference_seconds * 1000,
+                        'engine_ms': engine_seconds * 1000,
+                        'speedup': reference_seconds / engine_seconds if timed else np.nan,
+                    })
+
+    return pd.DataFrame(records)
+
+
+def summarize(results):
+    """สรุปผลต่อ (ฟังก์ชัน, engine): จำนวน case ที่ไม่เท่ากัน และ speedup"""
+    return results.groupby(['function', 'engine']).agg(
+        cases=('case', 'size'),
+        mismatches=('equivalent', lambda x: int((~x).sum())),
+        median_speedup=('speedup', 'median'),
+        min_speedup=('speedup', 'min'),
+        reference_ms=('reference_ms', 'sum'),
+        engine_ms=('engine_ms', 'sum'),
+    ).round(3)
+
+
+def load_engine(spec):
+    """โหลด engine จากรูปแบบ function_name=module:callable"""
+    function_name, target = spec.split("=", 1)
+    module_name, attribute = target.split(":", 1)
+    return function_name, target, getattr(importlib.import_module(module_name), attribute)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential check of optimized engines against the reference functions")
+    parser.add_argument("--cases", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--function", action="append", choices=list(REFERENCE_ENGINES), help="Only check these functions")
+    parser.add_argument("--engine", action="append", default=[],
+                        help="Candidate engine as function_name=module:callable (repeatable)")
+    parser.add_argument("--size", choices=list(SIZE_TIERS), default="small", help="Size tier of the generated frames")
+    parser.add_argument("--max-rows", type=int, help="Override the tier's maximum rows per frame")
+    parser.add_argument("--max-sensors", type=int, help="Override the tier's maximum sensors per frame")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--atol", type=float, default=1e-6)
+    args = parser.parse_args(argv)
+
+    for spec in args.engine:
+        register_engine(*load_engine(spec))
+
+    size = dict(SIZE_TIERS[args.size])
+    if args.max_rows:
+        size['max_rows'] = args.max_rows
+        size['min_rows'] = min(size['min_rows'], args.max_rows)
+    if args.max_sensors:
+        size['max_sensors'] = args.max_sensors
+        size['min_sensors'] = min(size['min_sensors'], args.max_sensors)
+
+    results = run_differential(args.cases, args.seed, args.function, args.rtol, args.atol, size)
+    print(summarize(results).to_string())
+
+    mismatches = results[~results['equivalent']]
+    if len(mismatches):
+        print(f"\n⚠️ {len(mismatches)} mismatches (seed={args.seed}):")
+        for row in mismatches.head(20).itertuples():
+            print(f"- case {row.case} {row.function} [{row.engine}]: {row.difference}")
+        sys.exit(1)
+    print(f"\n✅ All engines match the reference functions (seed={args.seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# เกณฑ์การยอมรับของการแมพปิ้ง
+TEMP_LIMIT = 25.0
+RH_LOW_LIMIT = 35.0
+RH_HIGH_LIMIT = 65.0
+
+# เกณฑ์อัตราการเปลี่ยนแปลง (ต่อนาที) และจำนวนแถวที่ใช้คำนวณอัตราแบบ rolling
+TEMP_RATE_LIMIT = 1.0
+RH_RATE_LIMIT = 5.0
+RATE_WINDOW = 5
+
+# ช่วงห่างของเวลา (วินาที) ที่ถือว่าข้อมูลขาดช่วง ใช้ค่าเดียวกับ check_data_loss
+MAX_GAP_SECONDS = 120
+
+EVENT_COLUMNS = ['sensor', 'measure', 'kind', 'start', 'end', 'duration_minutes', 'peak', 'limit']
+
+
+def _sensor_matrix(all_data, prefix):
+    """ดึงคอลัมน์เซ็นเซอร์ตาม prefix เป็น matrix (ค่า 0 ถือเป็นข้อมูลที่หายไป)"""
+    columns = [col for col in all_data.columns if col.startswith(prefix)]
+    sensors = np.array([int(col.replace(prefix, "")) for col in columns], dtype=int)
+    values = all_data[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float, copy=True)
+    values[values == 0] = np.nan
+    return sensors, values
+
+
+def _find_runs(flags, breaks):
+    """
+    หาช่วงที่ flags เป็น True ต่อเนื่องกันในทุกคอลัมน์พร้อมกัน (run-length encoding)
+
+    Parameters:
+    flags (ndarray): boolean matrix ขนาด (แถว, เซ็นเซอร์)
+    breaks (ndarray): boolean array ขนาด (แถว,) ที่ True เมื่อแถวนั้นเริ่มช่วงใหม่ (เวลาขาดช่วง)
+
+    Returns:
+    tuple: (คอลัมน์, แถวเริ่มต้น, แถวสิ้นสุดแบบ exclusive) เรียงตามคอลัมน์และเวลา
+    """
+    n_rows = flags.shape[0]
+    previous = np.vstack([np.zeros((1, flags.shape[1]), dtype=bool), flags[:-1]])
+    following = np.vstack([flags[1:], np.zeros((1, flags.shape[1]), dtype=bool)])
+    next_breaks = np.append(breaks[1:], True)
+
+    starts = flags & (~previous | breaks[:, None])
+    ends = flags & (~following | next_breaks[:, None])
+
+    # เรียงตามคอลัมน์ก่อน (transpose) เพื่อให้ start และ end จับคู่กันได้ตามลำดับ
+    start_cols, start_rows = np.nonzero(starts.T)
+    _, end_rows = np.nonzero(ends.T)
+    return start_cols, start_rows, np.minimum(end_rows + 1, n_rows)
+
+
+def _run_extremes(values, cols, start_rows, end_rows, reducer):
+    """หาค่าสูงสุด/ต่ำสุดของแต่ละช่วงด้วย reduceat (ไม่วนลูปทีละช่วง)"""
+    if len(cols) == 0:
+        return np.array([], dtype=float)
+    n_rows = values.shape[0]
+    flat = np.append(values.T.ravel(), np.nan)
+    offsets = cols * n_rows
+    bounds = np.ravel(np.column_stack([offsets + start_rows, offsets + end_rows]))
+    return reducer.reduceat(flat, bounds)[::2]
+
+
+def _runs_to_events(timestamps, sensors, values, flags, breaks, measure, kind, limit, reducer):
+    cols, start_rows, end_rows = _find_runs(flags, breaks)
+    start = timestamps[start_rows]
+    end = timestamps[end_rows - 1]
+    return pd.DataFrame({
+        'sensor': sensors[cols],
+        'measure': measure,
+        'kind': kind,
+        'start': start,
+        'end': end,
+        'duration_minutes': (end - start) / np.timedelta64(1, 'm') + 1,
+        'peak': _run_extremes(values, cols, start_rows, end_rows, reducer),
+        'limit': limit,
+    }, columns=EVENT_COLUMNS)
+
+
+def _rolling_rate(values, minutes, window):
+    """อัตราการเปลี่ยนแปลงต่อนาที เทียบกับค่าเมื่อ window แถวก่อนหน้า"""
+    rate = np.full(values.shape, np.nan)
+    if values.shape[0] > window:
+        elapsed = minutes[window:] - minutes[:-window]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate[window:] = (values[window:] - values[:-window]) / elapsed[:, None]
+    return rate
+
+
+def build_event_index(all_data, temp_limit=TEMP_LIMIT, rh_low=RH_LOW_LIMIT, rh_high=RH_HIGH_LIMIT,
+                      temp_rate_limit=TEMP_RATE_LIMIT, rh_rate_limit=RH_RATE_LIMIT, rate_window=RATE_WINDOW):
+    """
+    สร้างตาราง event ของการออกนอกเกณฑ์ (excursion) และการเปลี่ยนแปลงที่เร็วผิดปกติของทุกเซ็นเซอร์
+
+    คำนวณแบบ vectorized ทั้ง matrix ครั้งเดียว ไม่วนลูปทีละเซ็นเซอร์
+
+    Parameters:
+    all_data (DataFrame): ข้อมูลที่ ingest แล้ว (เรียงตาม timestamp)
+    temp_limit (float): อุณหภูมิสูงสุดที่ยอมรับได้ (C)
+    rh_low, rh_high (float): ช่วงความชื้นที่ยอมรับได้ (%RH)
+    temp_rate_limit, rh_rate_limit (float): อัตราการเปลี่ยนแปลงสูงสุดต่อนาที
+    rate_window (int): จำนวนแถวที่ใช้คำนวณอัตราการเปลี่ยนแปลง
+
+    Returns:
+    DataFrame: หนึ่งแถวต่อหนึ่ง event (sensor, measure, kind, start, end, duration_minutes, peak, limit)
+    """
+    if all_data is None or len(all_data) == 0:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    timestamps = pd.to_datetime(all_data['timestamp']).to_numpy()
+    minutes = (timestamps - timestamps[0]) / np.timedelta64(1, 'm')
+    breaks = np.concatenate([[True], np.diff(minutes) * 60 > MAX_GAP_SECONDS])
+
+    temp_sensors, temp_values = _sensor_matrix(all_data, "TempSensor")
+    rh_sensors, rh_values = _sensor_matrix(all_data, "RHSensor")
+
+    # NaN เปรียบเทียบแล้วได้ False เสมอ จึงไม่นับข้อมูลที่หายไปเป็น excursion
+    with np.errstate(invalid='ignore'):
+        temp_rate = np.abs(_rolling_rate(temp_values, minutes, rate_window))
+        rh_rate = np.abs(_rolling_rate(rh_values, minutes, rate_window))
+        event_frames = [
+            _runs_to_events(timestamps, temp_sensors, temp_values, temp_values > temp_limit, breaks,
+                            "temperature", "above_limit", temp_limit, np.fmax),
+            _runs_to_events(timestamps, rh_sensors, rh_values, rh_values > rh_high, breaks,
+                            "humidity", "above_limit", rh_high, np.fmax),
+            _runs_to_events(timestamps, rh_sensors, rh_values, rh_values < rh_low, breaks,
+                            "humidity", "below_limit", rh_low, np.fmin),
+            _runs_to_events(timestamps, temp_sensors, temp_rate, temp_rate > temp_rate_limit, breaks,
+                            "temperature", "rate_spike", temp_rate_limit, np.fmax),
+            _runs_to_events(timestamps, rh_sensors, rh_rate, rh_rate > rh_rate_limit, breaks,
+                            "humidity", "rate_spike", rh_rate_limit, np.fmax),
+        ]
+
+    event_frames = [frame for frame in event_frames if len(frame)]
+    if not event_frames:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    events = pd.concat(event_frames, ignore_index=True)
+    return events.sort_values(by=['sensor', 'start']).reset_index(drop=True)
+
+
+def build_window_event_index(all_data, columns, start_time, end_time, rate_window=RATE_WINDOW):
+    """
+    สร้างตาราง event เฉพาะช่วงเวลาและคอลัมน์ที่กำหนด (ใช้เมื่อไม่มีตาราง event ของข้อมูลชุดนั้น)
+
+    รวม rate_window แถวก่อน start_time เพื่อให้อัตราการเปลี่ยนแปลงที่ต้นช่วงเท่ากับตาราง event ของข้อมูลทั้งหมด
+    all_data ต้องเรียงตาม timestamp
+    """
+    timestamps = all_data['timestamp']
+    start_row = timestamps.searchsorted(pd.to_datetime(start_time), side='left')
+    end_row = timestamps.searchsorted(pd.to_datetime(end_time), side='right')
+    window = all_data.iloc[max(0, start_row - rate_window):end_row]
+    return build_event_index(window[['timestamp'] + list(columns)], rate_window=rate_window)
+
+
+@st.cache_data
+def build_event_index_cached(all_data):
+    """สร้างตาราง event พร้อมการ cache (คำนวณครั้งเดียวต่อชุดข้อมูลที่ ingest)"""
+    return build_event_index(all_data)
+
+
+def query_events(events, sensors=None, start_time=None, end_time=None, measure=None, kind=None):
+    """ดึง event ที่ตรงกับเงื่อนไข (เซ็นเซอร์, ช่วงเวลาที่ทับซ้อน, ประเภท)"""
+    mask = pd.Series(True, index=events.index)
+    if sensors is not None:
+        mask &= events['sensor'].isin(sensors)
+    if start_time is not None:
+        mask &= events['end'] >= pd.to_datetime(start_time)
+    if end_time is not None:
+        mask &= events['start'] <= pd.to_datetime(end_time)
+    if measure is not None:
+        mask &= events['measure'] == measure
+    if kind is not None:
+        mask &= events['kind'] == kind
+    return events[mask]
+
+
+def summarize_room_excursions(events, sensors, start_time, end_time):
+    """
+    สรุป excursion ของห้องจากตาราง event (ไม่ต้องสแกนข้อมูลดิบใหม่)
+
+    ช่วงเวลาของ event ที่คร่อมขอบของช่วงวิเคราะห์จะถูกตัดให้อยู่ในช่วงก่อนคำนวณระยะเวลา
+
+    Returns:
+    DataFrame: หนึ่งแถวต่อ (sensor, measure, kind) พร้อมจำนวนครั้ง ระยะเวลารวม ระยะเวลานานสุด และค่าสูงสุด/ต่ำสุด
+    """
+    room_events = query_events(events, sensors, start_time, end_time).copy()
+    summary_columns = ['sensor', 'measure', 'kind', 'events', 'total_minutes', 'longest_minutes', 'peak']
+    if len(room_events) == 0:
+        return pd.DataFrame(columns=summary_columns)
+
+    start = room_events['start'].clip(lower=pd.to_datetime(start_time))
+    end = room_events['end'].clip(upper=pd.to_datetime(end_time))
+    room_events['duration_minutes'] = (end - start) / pd.Timedelta(minutes=1) + 1
+
+    grouped = room_events.groupby(['sensor', 'measure', 'kind'])
+    summary = grouped.agg(
+        events=('duration_minutes', 'size'),
+        total_minutes=('duration_minutes', 'sum'),
+        longest_minutes=('duration_minutes', 'max'),
+        peak_max=('peak', 'max'),
+        peak_min=('peak', 'min'),
+    ).reset_index()
+    summary['peak'] = np.where(summary['kind'] == "below_limit", summary['peak_min'], summary['peak_max'])
+    return summary[summary_columns]
@@ -0,0 +1,360 @@
+import os
+import json
+import uuid
+import shutil
+import tempfile
+import hashlib
+import threading
+from io import StringIO
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from utils.analysis import analyze_room, get_ai_analysis, export_statistics_to_excel
+from utils.report_writer import write_study_report
+from utils.events import build_window_event_index, summarize_room_excursions
+
+# ขั้นตอนของ pipeline การวิเคราะห์ (เหมือนกับที่ Tab 2 เคยรันเอง)
+ANALYSIS_STEPS = [
+    "Filter data",
+    "Check data loss",
+    "Fill missing data",
+    "Calculate statistics",
+    "Store processed data",
+    "Summarize excursions",
+    "AI analysis",
+    "Export statistics",
+    "Save processed CSV",
+]
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_KIND_ANALYSIS = "analysis"
+JOB_KIND_STUDY_REPORT = "study_report"
+
+
+class AnalysisJob:
+    """สถานะและผลลัพธ์ของงานวิเคราะห์หนึ่งงาน"""
+
+    def __init__(self, job_id, job_key, params, kind=JOB_KIND_ANALYSIS, total_steps=len(ANALYSIS_STEPS)):
+        self.job_id = job_id
+        self.job_key = job_key
+        self.params = params
+        self.kind = kind
+        self.total_steps = total_steps
+        self.status = JOB_PENDING
+        self.step = 0
+        self.step_name = ""
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+
+    @property
+    def progress(self):
+        """สัดส่วนขั้นตอนที่ทำเสร็จแล้ว (0.0 - 1.0)"""
+        if self.status == JOB_DONE:
+            return 1.0
+        return self.step / self.total_steps
+
+    @property
+    def is_finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+
+def _data_fingerprint(all_data):
+    """สร้าง fingerprint จากค่าทุกแถวของข้อมูล (ไฟล์ที่แก้ไขค่าโดยจำนวนแถวเท่าเดิมจะได้ fingerprint ใหม่)"""
+    if all_data is None or len(all_data) == 0:
+        return "empty"
+    row_hashes = pd.util.hash_pandas_object(all_data, index=False).to_numpy()
+    return f"{','.join(all_data.columns)}|{hashlib.sha1(row_hashes.tobytes()).hexdigest()}"
+
+
+def make_job_key(all_data, params):
+    """สร้าง key สำหรับตรวจสอบงานที่ซ้ำกัน จากพารามิเตอร์และข้อมูลที่ใช้"""
+    key_params = dict(params)
+    # ใช้เฉพาะว่ามี API key หรือไม่ ไม่เก็บค่า key จริง
+    key_params['api_key'] = bool(params.get('api_key'))
+    payload = json.dumps(key_params, sort_keys=True, default=str) + _data_fingerprint(all_data)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _publish_latest(file_path, export_dir):
+    """คัดลอกไฟล์รายงานของงานไปไว้ที่ export_dir ในชื่อเดิมของห้อง (สำเนาของงานล่าสุดเท่านั้น แทนที่แบบ atomic)"""
+    fd, temp_path = tempfile.mkstemp(dir=export_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(file_path, temp_path)
+        os.replace(temp_path, os.path.join(export_dir, os.path.basename(file_path)))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def run_analysis_pipeline(all_data, params, export_dir="data/reports", on_step=None, job_id=None, events=None):
+    """
+    รัน pipeline การวิเคราะห์ทั้ง 9 ขั้นตอนสำหรับห้องที่เลือก
+
+    Parameters:
+    all_data (DataFrame): ข้อมูลเซ็นเซอร์ทั้งหมด
+    params (dict): room_number, room_name, start_time, end_time, start_sensor, end_sensor,
+                   additional_sensors, exclude_sensors, api_key
+    export_dir (str): โฟลเดอร์สำหรับบันทึกรายงาน
+    on_step (callable): ฟังก์ชันที่ถูกเรียกเมื่อเริ่มแต่ละขั้นตอน on_step(step_number, step_name)
+    job_id (str): หากระบุ รายงานของงานจะถูกเขียนใน export_dir/jobs/<job_id>/ เพื่อไม่ให้งานอื่นของห้องเดียวกันเขียนทับ
+                  และคัดลอกเป็นไฟล์ชื่อห้องใน export_dir (สำเนาของงานล่าสุด)
+    events (DataFrame): ตาราง event ที่สร้างจาก all_data ชุดเดียวกัน (หากไม่ระบุ จะสร้างเฉพาะช่วงเวลาของห้อง)
+
+    Returns:
+    dict: ผลลัพธ์การวิเคราะห์
+    """
+    def report(step):
+        if on_step:
+            on_step(step, ANALYSIS_STEPS[step - 1])
+
+    room_number = params['room_number']
+    room_name = params['room_name']
+
+    # 1-4. Filter data, check data loss, fill missing data and calculate statistics
+    analysis = analyze_room(all_data, params, lambda step_name: report(ANALYSIS_STEPS.index(step_name) + 1))
+    selected_data = analysis['selected_data']
+    filled_data = analysis['filled_data']
+    sensor_columns_temp = analysis['sensor_columns_temp']
+    sensor_columns_humidity = analysis['sensor_columns_humidity']
+    temp_stats = analysis['temp_stats']
+    humidity_stats = analysis['humidity_stats']
+
+    # 5. Store processed data
+    report(5)
+    result = {
+        'data_points': len(selected_data),
+        'preview': selected_data.head(10),
+        'data_loss_results': analysis['data_loss_results'],
+        'data_loss_warnings': analysis['data_loss_warnings'],
+        'filled_data': filled_data,
+        'sensor_columns_temp': sensor_columns_temp,
+        'sensor_columns_humidity': sensor_columns_humidity,
+        'room_number': room_number,
+        'room_name': room_name,
+        'start_sensor': params['start_sensor'],
+        'end_sensor': params['end_sensor'],
+        'temp_stats': temp_stats,
+        'humidity_stats': humidity_stats,
+    }
+
+    # 6. Summarize excursions จากข้อมูลชุดเดียวกับที่ใช้วิเคราะห์
+    report(6)
+    if events is None:
+        events = build_window_event_index(
+            all_data, sensor_columns_temp + sensor_columns_humidity, params['start_time'], params['end_time']
+        )
+    sensors = [int(col.replace("TempSensor", "")) for col in sensor_columns_temp]
+    result['excursions'] = summarize_room_excursions(events, sensors, params['start_time'], params['end_time'])
+
+    # 7. Get AI analysis
+    report(7)
+    result['ai_analysis'] = get_ai_analysis(temp_stats, humidity_stats, room_number, room_name, params.get('api_key'))
+
+    # รายงานของงานเขียนในโฟลเดอร์ของงานเอง
+    output_dir = export_dir if job_id is None else os.path.join(export_dir, "jobs", job_id)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 8. Export results
+    report(8)
+    result['export_path'] = export_statistics_to_excel(
+        temp_stats, humidity_stats, room_number, room_name, output_dir
+    )
+
+    # 9. Save processed data to CSV
+    report(9)
+    csv_export_path = os.path.join(output_dir, f"{room_number}_{room_name}_processed_data.csv")
+    filled_data.to_csv(csv_export_path, index=False)
+    result['csv_export_path'] = csv_export_path
+
+    if job_id is not None:
+        _publish_latest(result['export_path'], export_dir)
+        _publish_latest(csv_export_path, export_dir)
+
+    return result
+
+
+def _job_manifest_path(export_dir, job_id):
+    return os.path.join(export_dir, "jobs", f"{job_id}.json")
+
+
+def _job_series_path(export_dir, job_id):
+    return os.path.join(export_dir, "jobs", f"{job_id}.csv")
+
+
+def save_job_manifest(job, export_dir="data/reports"):
+    """บันทึกสถานะและผลลัพธ์ของงานเป็นไฟล์ JSON ใน data/reports/jobs"""
+    os.makedirs(os.path.join(export_dir, "jobs"), exist_ok=True)
+    manifest = {
+        'job_id': job.job_id,
+        'job_key': job.job_key,
+        'kind': job.kind,
+        'total_steps': job.total_steps,
+        'params': {k: v for k, v in job.params.items() if k != 'api_key'},
+        'status': job.status,
+        'step': job.step,
+        'step_name': job.step_name,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': None,
+    }
+    if job.result is not None:
+        result = dict(job.result)
+        # บันทึก filled_data เป็น CSV เฉพาะของงานนี้ (ใช้ CSV ในโฟลเดอร์ของงานหากมีแล้ว)
+        filled_data = result.pop('filled_data', None)
+        if filled_data is not None:
+            job_dir = os.path.join(export_dir, "jobs", job.job_id)
+            if os.path.dirname(result.get('csv_export_path', "")) == job_dir:
+                result['series_path'] = result['csv_export_path']
+            else:
+                result['series_path'] = _job_series_path(export_dir, job.job_id)
+                filled_data.to_csv(result['series_path'], index=False)
+        for name in ('preview', 'temp_stats', 'humidity_stats', 'excursions'):
+            if name in result:
+                result[name] = result[name].to_json(orient="split", date_format="iso")
+        manifest['result'] = result
+
+    path = _job_manifest_path(export_dir, job.job_id)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, default=str)
+    return path
+
+
+def load_job_manifest(job_id, export_dir="data/reports"):
+    """โหลดงานที่บันทึกไว้กลับมาเป็น AnalysisJob (คืนค่า None หากไม่พบ)"""
+    path = _job_manifest_path(export_dir, job_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    job = AnalysisJob(manifest['job_id'], manifest['job_key'], manifest['params'],
+                      manifest.get('kind', JOB_KIND_ANALYSIS), manifest.get('total_steps', len(ANALYSIS_STEPS)))
+    job.status = manifest['status']
+    job.step = manifest['step']
+    job.step_name = manifest['step_name']
+    job.error = manifest['error']
+    job.created_at = datetime.fromisoformat(manifest['created_at'])
+    if manifest['finished_at']:
+        job.finished_at = datetime.fromisoformat(manifest['finished_at'])
+
+    result = manifest['result']
+    if result is not None:
+        for name in ('preview', 'temp_stats', 'humidity_stats', 'excursions'):
+            if name in result:
+                result[name] = pd.read_json(StringIO(result[name]), orient="split")
+        # หากไฟล์ข้อมูลของงานถูกลบไปแล้ว คืนค่างานโดยไม่มี filled_data
+        series_path = result.get('series_path')
+        if series_path and os.path.exists(series_path):
+            filled_data = pd.read_csv(series_path)
+            filled_data['timestamp'] = pd.to_datetime(filled_data['timestamp'], format='mixed')
+            result['filled_data'] = filled_data
+        job.result = result
+    return job
+
+
+class JobScheduler:
+    """
+    คิวงานวิเคราะห์แบบ local พร้อม worker pool
+
+    - รันงานใน thread แยกเพื่อไม่ให้ script ของ Streamlit ถูก block
+    - งานที่พารามิเตอร์และข้อมูลเหมือนกันและยังไม่เสร็จ จะได้ job_id เดิม
+    - บันทึกผลลัพธ์ไว้ใน export_dir เพื่อให้โหลดกลับได้หลัง refresh
+    - เก็บงานที่เสร็จแล้วในหน่วยความจำเพียง max_finished_jobs งานล่าสุด (LRU) ที่เหลือโหลดจากไฟล์
+    """
+
+    def __init__(self, max_workers=2, export_dir="data/reports", max_finished_jobs=8):
+        self.export_dir = export_dir
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._in_flight = {}
+
+    def submit(self, all_data, params, events=None):
+        """ส่งงานวิเคราะห์เข้าคิว และคืนค่า job_id (events คือตาราง event ของ all_data ชุดเดียวกัน ถ้ามี)"""
+        return self._submit(all_data, dict(params), JOB_KIND_ANALYSIS, len(ANALYSIS_STEPS), events)
+
+    def submit_study_report(self, all_data, rooms, include_series=False):
+        """ส่งงานสร้างรายงาน Excel รวมของหลายห้องเข้าคิว และคืนค่า job_id"""
+        params = {'rooms': [dict(room) for room in rooms], 'include_series': include_series}
+        # หนึ่งขั้นตอนต่อห้อง และขั้นตอนสุดท้ายสำหรับเขียน Summary
+        return self._submit(all_data, params, JOB_KIND_STUDY_REPORT, len(rooms) + 1)
+
+    def _submit(self, all_data, params, kind, total_steps, events=None):
+        job_key = make_job_key(all_data, dict(params, kind=kind))
+        with self._lock:
+            # งานเดียวกันที่ยังรันอยู่ ไม่ต้องรันซ้ำ
+            if job_key in self._in_flight:
+                return self._in_flight[job_key]
+
+            job = AnalysisJob(uuid.uuid4().hex, job_key, params, kind, total_steps)
+            self._jobs[job.job_id] = job
+            self._in_flight[job_key] = job.job_id
+
+        self._executor.submit(self._run_job, job, all_data, events)
+        return job.job_id
+
+    def get_job(self, job_id):
+        """ดึงสถานะงานจากหน่วยความจำ หรือจากไฟล์ที่บันทึกไว้"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None and job_id in self._finished:
+                self._finished.move_to_end(job_id)
+                job = self._finished[job_id]
+        if job is None:
+            job = load_job_manifest(job_id, self.export_dir)
+            if job is not None:
+                with self._lock:
+                    self._remember_finished(job)
+        return job
+
+    def _remember_finished(self, job):
+        """ย้ายงานที่เสร็จแล้วเข้า LRU และตัดงานที่เก่าที่สุดออก (เรียกขณะถือ lock)"""
+        self._jobs.pop(job.job_id, None)
+        self._finished[job.job_id] = job
+        self._finished.move_to_end(job.job_id)
+        while len(self._finished) > self.max_finished_jobs:
+            self._finished.popitem(last=False)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run_job(self, job, all_data, events=None):
+        def on_step(step, step_name):
+            job.step = step
+            job.step_name = step_name
+
+        job.status = JOB_RUNNING
+        try:
+            if job.kind == JOB_KIND_STUDY_REPORT:
+                job.result = write_study_report(
+                    all_data, job.params['rooms'], self.export_dir, job.params['include_series'], on_step
+                )
+            else:
+                job.result = run_analysis_pipeline(all_data, job.params, self.export_dir, on_step, job.job_id, events)
+            job.status = JOB_DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = datetime.now()
+            try:
+                save_job_manifest(job, self.export_dir)
+            except Exception as e:
+                if job.error is None:
+                    job.error = f"Error saving job manifest: {str(e)}"
+            with self._lock:
+                self._in_flight.pop(job.job_key, None)
+                self._remember_finished(job)
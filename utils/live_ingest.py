@@ -0,0 +1,346 @@
+import os
+import sys
+import time
+import socket
+import threading
+from io import StringIO
+from itertools import islice
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# ช่วงห่างของเวลา (วินาที) ที่ถือว่าเป็นช่วงข้อมูลขาดหายคนละช่วง ใช้ค่าเดียวกับ check_data_loss
+MAX_GAP_SECONDS = 120
+
+
+def latest_csv_file(directory, prefix="GPOWirelessTemp_"):
+    """หาไฟล์ CSV ของวันล่าสุด (ชื่อไฟล์มีวันที่ต่อท้าย เรียงตามชื่อได้)"""
+    if not os.path.exists(directory):
+        return None
+    files = sorted(f for f in os.listdir(directory) if f.startswith(prefix) and f.endswith(".csv"))
+    return os.path.join(directory, files[-1]) if files else None
+
+
+def _parse_rows(header, lines):
+    """แปลงบรรทัด CSV เป็น DataFrame พร้อมแปลงคอลัมน์เวลา"""
+    if not lines:
+        return None
+    rows = pd.read_csv(StringIO(header + "".join(lines)), on_bad_lines='skip')
+    rows['timestamp'] = pd.to_datetime(rows['timestamp'], format='mixed', errors='coerce')
+    return rows.dropna(subset=['timestamp'])
+
+
+class CsvTailer:
+    """
+    ติดตามไฟล์ CSV ที่กำลังถูกเขียนเพิ่ม โดยอ่านเฉพาะส่วนที่ต่อท้ายมาใหม่
+
+    - จำตำแหน่ง byte ล่าสุดที่อ่าน จึงไม่อ่านไฟล์ทั้งไฟล์ซ้ำ
+    - อ่านเฉพาะบรรทัดที่สมบูรณ์ (ลงท้ายด้วย newline)
+    - เมื่อมีไฟล์ของวันใหม่ในโฟลเดอร์ จะอ่านไฟล์เดิมให้หมดแล้วเปลี่ยนไปติดตามไฟล์ใหม่
+    """
+
+    def __init__(self, directory, from_start=False):
+        self.directory = directory
+        self.from_start = from_start
+        self.file_path = None
+        self._offset = 0
+        self._header = None
+
+    def _open(self, file_path, from_start):
+        self.file_path = file_path
+        with open(file_path, "r", encoding="utf-8", newline="") as f:
+            self._header = f.readline()
+            self._offset = f.tell()
+        if not from_start:
+            self._offset = self._complete_size(file_path)
+
+    def _complete_size(self, file_path):
+        """ขนาดไฟล์ถึง newline สุดท้าย (ไม่รวมบรรทัดที่ยังเขียนไม่เสร็จ)"""
+        size = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+        last_newline = tail.rfind(b"\n")
+        return size - len(tail) + last_newline + 1 if last_newline >= 0 else self._offset
+
+    def _read_lines(self):
+        if os.path.getsize(self.file_path) < self._offset:
+            # ไฟล์ถูกเขียนทับใหม่ เริ่มอ่านใหม่ตั้งแต่ต้น
+            self._open(self.file_path, from_start=True)
+        with open(self.file_path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        last_newline = chunk.rfind(b"\n")
+        if last_newline < 0:
+            return []
+        self._offset += last_newline + 1
+        return chunk[:last_newline + 1].decode("utf-8").splitlines(keepends=True)
+
+    def read_new_rows(self):
+        """อ่านแถวใหม่ที่ต่อท้ายไฟล์ตั้งแต่ครั้งก่อน (คืนค่า None หากไม่มี)"""
+        latest = latest_csv_file(self.directory)
+        if latest is None:
+            return None
+        if self.file_path is None:
+            self._open(latest, self.from_start)
+
+        lines = self._read_lines()
+        header = self._header
+        if latest != self.file_path:
+            # ขึ้นวันใหม่ ไฟล์ใหม่เริ่มจากต้นไฟล์
+            parsed = _parse_rows(header, lines)
+            self._open(latest, from_start=True)
+            new_rows = _parse_rows(self._header, self._read_lines())
+            frames = [frame for frame in (parsed, new_rows) if frame is not None]
+            return pd.concat(frames, ignore_index=True) if frames else None
+        return _parse_rows(header, lines)
+
+
+class SocketFeed:
+    """
+    รับข้อมูลแบบ live ผ่าน TCP socket บนเครื่อง (สำหรับ simulator)
+
+    แต่ละ connection ส่งข้อมูลเป็นบรรทัด CSV โดยบรรทัดแรกคือ header
+    บรรทัดที่ได้รับเก็บใน buffer ที่จำกัดขนาด และไม่ถูกลบเมื่ออ่าน
+    ผู้อ่านแต่ละรายใช้ subscribe() เพื่อได้ตำแหน่งอ่านของตัวเอง จึงได้รับข้อมูลครบทุกแถว
+    """
+
+    def __init__(self, host="127.0.0.1", port=9009, max_buffered_lines=100000):
+        self.host = host
+        self.port = port
+        self._lines = deque(maxlen=max_buffered_lines)
+        # ลำดับของบรรทัดถัดไปที่จะได้รับ (นับรวมบรรทัดที่หลุดออกจาก buffer แล้ว)
+        self._next_seq = 0
+        self._header = None
+        self._lock = threading.Lock()
+        self._server = socket.create_server((host, port))
+        self._thread = threading.Thread(target=self._serve, name="live-socket-feed", daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._receive, args=(connection,), daemon=True).start()
+
+    def _receive(self, connection):
+        with connection, connection.makefile("r", encoding="utf-8", newline="") as stream:
+            header = stream.readline()
+            if not header:
+                return
+            with self._lock:
+                self._header = header
+            for line in stream:
+                if line.endswith("\n"):
+                    with self._lock:
+                        self._lines.append(line)
+                        self._next_seq += 1
+
+    def read_lines_since(self, seq):
+        """
+        บรรทัดที่ได้รับตั้งแต่ลำดับ seq (ไม่ลบออกจาก buffer)
+
+        Returns:
+        tuple: (header, lines, ลำดับถัดไปสำหรับการอ่านครั้งต่อไป)
+        """
+        with self._lock:
+            # อ่านเฉพาะส่วนท้ายของ buffer ต้นทุนขึ้นกับจำนวนบรรทัดใหม่เท่านั้น
+            n_new = min(self._next_seq - seq, len(self._lines))
+            lines = list(islice(reversed(self._lines), n_new))[::-1]
+            return self._header, lines, self._next_seq
+
+    def subscribe(self):
+        """สร้างผู้อ่านใหม่ที่เริ่มอ่านจากบรรทัดแรกที่ยังอยู่ใน buffer"""
+        return SocketSubscription(self)
+
+    def close(self):
+        self._server.close()
+
+
+class SocketSubscription:
+    """ตำแหน่งอ่านของผู้อ่านหนึ่งราย (เช่น หนึ่ง session) บน SocketFeed ที่ใช้ร่วมกัน"""
+
+    def __init__(self, feed):
+        self.feed = feed
+        self._seq = 0
+
+    def read_new_rows(self):
+        """ดึงแถวที่ได้รับมาใหม่ตั้งแต่การอ่านครั้งก่อน (คืนค่า None หากไม่มี)"""
+        header, lines, self._seq = self.feed.read_lines_since(self._seq)
+        if header is None:
+            return None
+        return _parse_rows(header, lines)
+
+
+class LiveStore:
+    """
+    ที่เก็บข้อมูล live ในหน่วยความจำ พร้อมสถิติและช่วงข้อมูลขาดหายแบบ incremental
+
+    แต่ละครั้งที่ update จะคำนวณเฉพาะแถวใหม่ ต้นทุนต่อการ update จึงขึ้นกับจำนวนแถวใหม่เท่านั้น
+    ส่วนข้อมูลที่เก็บไว้สำหรับกราฟจำกัดไว้ที่ max_rows แถวล่าสุด
+    """
+
+    def __init__(self, max_rows=20160, max_gaps=1000):
+        self.max_rows = max_rows
+        self._chunks = deque()
+        self._rows = 0
+        self.last_timestamp = None
+        self.total_rows = 0
+        self._columns = []
+        # สถิติสะสม (Welford/Chan) ต่อคอลัมน์เซ็นเซอร์
+        self._count = None
+        self._mean = None
+        self._m2 = None
+        self._min = None
+        self._max = None
+        # ช่วงข้อมูลขาดหาย (ค่าเป็น 0) ของแต่ละ TempSensor เก็บเฉพาะ max_gaps ช่วงล่าสุดที่สิ้นสุดแล้ว
+        self._open_gaps = {}
+        self.closed_gaps = deque(maxlen=max_gaps)
+        self.closed_gap_count = 0
+
+    def update(self, new_rows):
+        """เพิ่มแถวใหม่ และอัปเดตสถิติและช่วงข้อมูลขาดหาย คืนค่าจำนวนแถวที่เพิ่มจริง"""
+        if new_rows is None or len(new_rows) == 0:
+            return 0
+        new_rows = new_rows.sort_values(by='timestamp')
+        if self.last_timestamp is not None:
+            new_rows = new_rows[new_rows['timestamp'] > self.last_timestamp]
+        if len(new_rows) == 0:
+            return 0
+
+        if not self._columns:
+            self._columns = [col for col in new_rows.columns if col.startswith(("TempSensor", "RHSensor"))]
+            self._init_stats(len(self._columns))
+        new_rows = new_rows.reindex(columns=['timestamp'] + self._columns).reset_index(drop=True)
+
+        self._update_stats(new_rows)
+        self._update_gaps(new_rows)
+
+        # เก็บเฉพาะ max_rows แถวล่าสุด
+        self._chunks.append(new_rows)
+        self._rows += len(new_rows)
+        while self._rows - len(self._chunks[0]) >= self.max_rows:
+            self._rows -= len(self._chunks.popleft())
+
+        self.last_timestamp = new_rows['timestamp'].iloc[-1]
+        self.total_rows += len(new_rows)
+        return len(new_rows)
+
+    def _init_stats(self, n_columns):
+        self._count = np.zeros(n_columns)
+        self._mean = np.zeros(n_columns)
+        self._m2 = np.zeros(n_columns)
+        self._min = np.full(n_columns, np.nan)
+        self._max = np.full(n_columns, np.nan)
+
+    def _update_stats(self, new_rows):
+        values = new_rows[self._columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float, copy=True)
+        # ค่า 0 คือข้อมูลที่หายไป ไม่นำมาคำนวณสถิติ
+        values[values == 0] = np.nan
+        missing = np.isnan(values)
+        count = np.sum(~missing, axis=0)
+        safe_count = np.where(count > 0, count, 1)
+
+        mean = np.where(missing, 0.0, values).sum(axis=0) / safe_count
+        m2 = np.where(missing, 0.0, (values - mean) ** 2).sum(axis=0)
+        batch_min = np.where(missing, np.inf, values).min(axis=0)
+        batch_max = np.where(missing, -np.inf, values).max(axis=0)
+        batch_min[count == 0] = np.nan
+        batch_max[count == 0] = np.nan
+        self._min = np.fmin(self._min, batch_min)
+        self._max = np.fmax(self._max, batch_max)
+
+        # รวมสถิติของ batch ใหม่เข้ากับสถิติเดิม (Chan et al.)
+        total = self._count + count
+        delta = mean - self._mean
+        safe_total = np.where(total > 0, total, 1)
+        self._mean = self._mean + delta * count / safe_total
+        self._m2 = self._m2 + m2 + delta ** 2 * self._count * count / safe_total
+        self._count = total
+
+    def _update_gaps(self, new_rows):
+        timestamps = new_rows['timestamp'].to_numpy()
+        max_gap = np.timedelta64(MAX_GAP_SECONDS, 's')
+        for col in self._columns:
+            if not col.startswith("TempSensor"):
+                continue
+            zero_times = timestamps[new_rows[col].to_numpy() == 0.0]
+            if len(zero_times) == 0:
+                continue
+            sensor = int(col.replace("TempSensor", ""))
+
+            # แบ่งช่วงตามเวลาที่ห่างกันเกิน MAX_GAP_SECONDS เหมือน check_data_loss
+            breaks = np.nonzero(np.diff(zero_times) > max_gap)[0]
+            starts = list(zero_times[np.concatenate([[0], breaks + 1])])
+            ends = list(zero_times[np.concatenate([breaks, [len(zero_times) - 1]])])
+
+            # ต่อช่วงแรกเข้ากับช่วงที่ยังเปิดอยู่จาก update ก่อนหน้า
+            open_gap = self._open_gaps.pop(sensor, None)
+            if open_gap is not None and starts[0] - open_gap[1] <= max_gap:
+                starts[0] = open_gap[0]
+            elif open_gap is not None:
+                self._close_gap(sensor, open_gap[0], open_gap[1])
+
+            for start, end in zip(starts[:-1], ends[:-1]):
+                self._close_gap(sensor, pd.Timestamp(start), pd.Timestamp(end))
+            self._open_gaps[sensor] = (pd.Timestamp(starts[-1]), pd.Timestamp(ends[-1]))
+
+    def _close_gap(self, sensor, start, end):
+        self.closed_gaps.append((sensor, start, end))
+        self.closed_gap_count += 1
+
+    @property
+    def gap_count(self):
+        """จำนวนช่วงข้อมูลขาดหายทั้งหมดตั้งแต่เริ่ม (รวมช่วงที่เก่ากว่า max_gaps และช่วงที่ยังไม่สิ้นสุด)"""
+        return self.closed_gap_count + len(self._open_gaps)
+
+    def recent(self, minutes=None):
+        """ข้อมูลล่าสุดที่เก็บไว้ (จำกัดเฉพาะ minutes นาทีล่าสุดหากระบุ)"""
+        if not self._chunks:
+            return pd.DataFrame(columns=['timestamp'] + self._columns)
+        data = pd.concat(self._chunks, ignore_index=True).tail(self.max_rows)
+        if minutes is not None:
+            data = data[data['timestamp'] >= self.last_timestamp - pd.Timedelta(minutes=minutes)]
+        return data.reset_index(drop=True)
+
+    def statistics(self):
+        """สถิติสะสม (mean, std, min, max) ในรูปแบบเดียวกับ calculate_statistics"""
+        if self._count is None:
+            return pd.DataFrame(index=["mean", "std", "min", "max"])
+        std = np.sqrt(self._m2 / np.where(self._count > 1, self._count - 1, 1))
+        stats = pd.DataFrame(
+            [np.where(self._count > 0, self._mean, np.nan), np.where(self._count > 1, std, np.nan), self._min, self._max],
+            index=["mean", "std", "min", "max"], columns=self._columns
+        )
+        stats.loc[["mean", "std"]] = stats.loc[["mean", "std"]].round(4)
+        return stats
+
+    def gaps(self):
+        """ช่วงข้อมูลขาดหายล่าสุด (ไม่เกิน max_gaps ช่วงที่สิ้นสุดแล้ว รวมช่วงที่ยังไม่สิ้นสุด) เป็น DataFrame"""
+        gaps = list(self.closed_gaps) + [(sensor, start, end) for sensor, (start, end) in self._open_gaps.items()]
+        gaps_df = pd.DataFrame(gaps, columns=['sensor', 'start', 'end'])
+        if len(gaps_df) == 0:
+            return pd.DataFrame(columns=['sensor', 'start', 'end', 'duration_minutes', 'ongoing'])
+        gaps_df['duration_minutes'] = (gaps_df['end'] - gaps_df['start']).dt.total_seconds() / 60 + 1
+        gaps_df['ongoing'] = gaps_df['end'] >= self.last_timestamp if self.last_timestamp is not None else False
+        return gaps_df.sort_values(by=['sensor', 'start']).reset_index(drop=True)
+
+
+def simulate_feed(csv_file, host="127.0.0.1", port=9009, rows_per_second=10.0):
+    """ส่งข้อมูลจากไฟล์ CSV เข้า SocketFeed ทีละแถว (ใช้ทดสอบโหมด live)"""
+    with open(csv_file, "r", encoding="utf-8", newline="") as f, socket.create_connection((host, port)) as connection:
+        connection.sendall(f.readline().encode("utf-8"))
+        for line in f:
+            connection.sendall(line.encode("utf-8"))
+            time.sleep(1.0 / rows_per_second)
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python -m utils.live_ingest <csv_file> [port] [rows_per_second]
+    simulate_feed(
+        sys.argv[1],
+        port=int(sys.argv[2]) if len(sys.argv) > 2 else 9009,
+        rows_per_second=float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    )
@@ -0,0 +1,269 @@
+import threading
+from bisect import bisect_right
+from datetime import datetime, time
+import pandas as pd
+
+from utils.data_catalog import file_checksum
+
+REQUIRED_COLUMNS = ['Start date', 'End date', 'Time', 'room number', 'room name', 'Sensor start', 'Sensor stop']
+
+_plan_cache = {}
+_plan_cache_lock = threading.Lock()
+
+
+class PlanEntry:
+    """รายการแมพปิ้งหนึ่งห้องในแผน (หนึ่งแถวของ sheet "Report")"""
+
+    def __init__(self, index, room_number, room_name, start_time, end_time, start_sensor, end_sensor):
+        self.index = index
+        self.room_number = room_number
+        self.room_name = room_name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start_sensor = start_sensor
+        self.end_sensor = end_sensor
+        # False เมื่อพบข้อมูลที่ไม่ถูกต้องตอน compile (ดู MappingPlan.issues)
+        self.is_valid = True
+
+    @property
+    def is_scheduled(self):
+        """มีช่วงเวลาและช่วงเซ็นเซอร์ที่ใช้วิเคราะห์ได้หรือไม่"""
+        return (pd.notna(self.start_time) and pd.notna(self.end_time)
+                and self.start_sensor is not None and self.end_sensor is not None)
+
+    @property
+    def sensors(self):
+        if self.start_sensor is None or self.end_sensor is None:
+            return []
+        return list(range(self.start_sensor, self.end_sensor + 1))
+
+    @property
+    def label(self):
+        return f"{self.index}: {self.room_number} - {self.room_name}"
+
+
+class MappingPlan:
+    """
+    แผนแมพปิ้งที่ compile แล้ว พร้อม interval index จาก (sensor, timestamp) ไปยังห้อง
+
+    - ค้นหาห้องของเซ็นเซอร์ ณ เวลาใดๆ ได้ใน O(log n) ด้วย bisect
+    - ตรวจสอบรายการที่ไม่ถูกต้องหรือซ้อนทับกันไว้ล่วงหน้าใน issues
+    """
+
+    def __init__(self, rows, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.rows = rows
+        self.entries = [_entry_from_row(index, row) for index, row in enumerate(rows)]
+        self.issues = []
+        self._entries_by_index = {entry.index: entry for entry in self.entries}
+        self._sensor_index = {}
+        self._build_index()
+
+    def _validate_entry(self, entry):
+        """ตรวจสอบรายการหนึ่งห้อง คืนค่ารายการปัญหาที่พบ (ช่องที่มีค่าแต่แปลงค่าไม่ได้ หรือช่วงไม่ถูกต้อง)"""
+        row = self.rows[entry.index]
+        issues = []
+        # End date เป็นสูตรจาก Start date จึงตรวจเวลาสิ้นสุดเฉพาะแถวที่กรอกเวลาเริ่มต้นแล้ว
+        has_start = row.get('Start date') is not None or row.get('Time') is not None
+        if has_start and pd.isna(entry.start_time):
+            issues.append(f"{entry.room_number}: invalid start date or time ({row.get('Start date')!r}, {row.get('Time')!r})")
+        if has_start and row.get('End date') is not None and pd.isna(entry.end_time):
+            issues.append(f"{entry.room_number}: invalid end date ({row.get('End date')!r})")
+        for column, value in (('Sensor start', entry.start_sensor), ('Sensor stop', entry.end_sensor)):
+            if row.get(column) is not None and value is None:
+                issues.append(f"{entry.room_number}: invalid {column.lower()} ({row.get(column)!r})")
+        if issues or not entry.is_scheduled:
+            return issues
+
+        if entry.end_time <= entry.start_time:
+            issues.append(f"{entry.room_number}: end time {entry.end_time} is not after start time {entry.start_time}")
+        if entry.end_sensor < entry.start_sensor:
+            issues.append(f"{entry.room_number}: sensor stop {entry.end_sensor} is before sensor start {entry.start_sensor}")
+        return issues
+
+    def _build_index(self):
+        intervals = {}
+        for entry in self.entries:
+            if pd.isna(entry.room_number):
+                continue
+            entry_issues = self._validate_entry(entry)
+            if entry_issues:
+                # ไม่นำรายการที่ไม่ถูกต้องไปใช้วิเคราะห์
+                self.issues.extend(entry_issues)
+                entry.is_valid = False
+                continue
+            if not entry.is_scheduled:
+                continue
+            for sensor in entry.sensors:
+                intervals.setdefault(sensor, []).append(entry)
+
+        for sensor, entries in intervals.items():
+            entries.sort(key=lambda e: e.start_time)
+            # ตรวจสอบช่วงเวลาที่ซ้อนทับกันของเซ็นเซอร์เดียวกัน
+            for previous, current in zip(entries, entries[1:]):
+                if current.start_time < previous.end_time:
+                    self.issues.append(
+                        f"Sensor {sensor} is assigned to both {previous.room_number} and {current.room_number} "
+                        f"between {current.start_time} and {min(previous.end_time, current.end_time)}"
+                    )
+            self._sensor_index[sensor] = ([e.start_time for e in entries], entries)
+
+    def get_entry(self, index):
+        """ดึงรายการตาม index ของแถวในแผน"""
+        return self._entries_by_index[index]
+
+    def scheduled_entries(self):
+        """รายการห้องที่มีช่วงเวลาและเซ็นเซอร์ครบถ้วนและถูกต้อง"""
+        return [entry for entry in self.entries if entry.is_scheduled and entry.is_valid]
+
+    def room_options(self):
+        """รายการห้องสำหรับให้ผู้ใช้เลือก (มีเลขห้องและชื่อห้อง และไม่มีข้อมูลที่ไม่ถูกต้อง)"""
+        return [entry for entry in self.entries
+                if pd.notna(entry.room_number) and pd.notna(entry.room_name) and entry.is_valid]
+
+    def find_room(self, sensor, timestamp):
+        """หาห้องที่เซ็นเซอร์ติดตั้งอยู่ ณ เวลาที่กำหนด (คืนค่า None หากไม่พบ)"""
+        if sensor not in self._sensor_index:
+            return None
+        starts, entries = self._sensor_index[sensor]
+        timestamp = pd.Timestamp(timestamp)
+        position = bisect_right(starts, timestamp) - 1
+        if position < 0:
+            return None
+        entry = entries[position]
+        return entry if timestamp <= entry.end_time else None
+
+    def sensor_schedule(self, sensor):
+        """รายการห้องของเซ็นเซอร์ เรียงตามเวลาเริ่มต้น"""
+        return list(self._sensor_index.get(sensor, ([], []))[1])
+
+    def sensor_conflicts(self, entry, sensors):
+        """
+        ตรวจสอบเซ็นเซอร์ที่จะเพิ่มเข้าห้อง entry ว่าติดตั้งอยู่ในห้องอื่นระหว่างช่วงเวลาของ entry หรือไม่
+
+        Returns:
+        list: ข้อความอธิบายแต่ละกรณีที่ซ้อนทับ
+        """
+        if not entry.is_scheduled:
+            return []
+        conflicts = []
+        for sensor in sensors:
+            # ห้องที่เซ็นเซอร์อยู่ ณ เวลาเริ่มต้น และห้องอื่นที่เริ่มระหว่างช่วงเวลาของ entry
+            rooms = [self.find_room(sensor, entry.start_time)]
+            rooms += [other for other in self.sensor_schedule(sensor) if entry.start_time < other.start_time < entry.end_time]
+            for other in rooms:
+                if other is None or other is entry:
+                    continue
+                conflicts.append(
+                    f"Sensor {sensor} is in {other.room_number} - {other.room_name} "
+                    f"from {other.start_time} to {other.end_time}"
+                )
+        return conflicts
+
+    def to_dataframe(self):
+        """แปลงเป็น DataFrame ในรูปแบบเดียวกับผลลัพธ์เดิมของ parse_excel_file"""
+        index_df = pd.DataFrame(self.rows)
+        index_df['start_time'] = pd.to_datetime(pd.Series([e.start_time for e in self.entries], dtype=object), errors='coerce')
+        index_df['end_time'] = pd.to_datetime(pd.Series([e.end_time for e in self.entries], dtype=object), errors='coerce')
+        return index_df
+
+
+def _to_int(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _combine_date_time(date_value, time_value):
+    """รวมวันที่และเวลาจาก Excel เป็น Timestamp (คืนค่า NaT หากข้อมูลไม่ครบหรือไม่ถูกต้อง)"""
+    if date_value is None or time_value is None:
+        return pd.NaT
+    date = pd.to_datetime(date_value, errors='coerce')
+    if pd.isna(date):
+        return pd.NaT
+
+    if isinstance(time_value, datetime):
+        time_of_day = time_value.time()
+    elif isinstance(time_value, time):
+        time_of_day = time_value
+    else:
+        parsed = pd.to_datetime(str(time_value), errors='coerce')
+        if pd.isna(parsed):
+            return pd.NaT
+        time_of_day = parsed.time()
+    return pd.Timestamp(datetime.combine(date.date(), time_of_day))
+
+
+def _entry_from_row(index, row):
+    start_date = row.get('Start date')
+    end_date = row.get('End date')
+    # ใช้ Duration แทนหากไม่มีค่าที่คำนวณไว้ของสูตร End date
+    if end_date is None and start_date is not None and _to_int(row.get('Duration')) is not None:
+        start = pd.to_datetime(start_date, errors='coerce')
+        if pd.notna(start):
+            end_date = start + pd.Timedelta(days=_to_int(row['Duration']))
+            row['End date'] = end_date
+
+    return PlanEntry(
+        index,
+        row.get('room number'),
+        row.get('room name'),
+        _combine_date_time(start_date, row.get('Time')),
+        _combine_date_time(end_date, row.get('Time')),
+        _to_int(row.get('Sensor start')),
+        _to_int(row.get('Sensor stop')),
+    )
+
+
+def read_plan_rows(excel_file_path, sheet_name="Report"):
+    """อ่านแถวของ sheet แผนแมพปิ้งด้วย openpyxl แบบ read-only (streaming)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        rows_iter = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows_iter, None)
+        if header is None:
+            raise ValueError(f"Sheet '{sheet_name}' is empty")
+        columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+
+        missing_cols = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing_cols:
+            raise ValueError(f"Missing columns in Excel file: {missing_cols}")
+
+        rows = []
+        for values in rows_iter:
+            # ข้ามแถวว่าง
+            if all(value is None for value in values):
+                continue
+            rows.append(dict(zip(columns, values)))
+        return rows
+    finally:
+        workbook.close()
+
+
+def compile_mapping_plan(excel_file_path, fingerprint=None):
+    """อ่านและ compile แผนแมพปิ้งจากไฟล์ Excel"""
+    try:
+        return MappingPlan(read_plan_rows(excel_file_path), fingerprint)
+    except Exception as e:
+        raise Exception(f"Error parsing Excel file: {str(e)}")
+
+
+def load_mapping_plan(excel_file_path):
+    """
+    โหลดแผนแมพปิ้ง โดย compile ใหม่เฉพาะเมื่อเนื้อหาไฟล์เปลี่ยน (ตาม checksum)
+
+    แผนที่ compile แล้วจะถูกเก็บไว้ในหน่วยความจำของ process และใช้ร่วมกันทุก session
+    """
+    fingerprint = file_checksum(excel_file_path)
+    with _plan_cache_lock:
+        plan = _plan_cache.get(fingerprint)
+    if plan is None:
+        plan = compile_mapping_plan(excel_file_path, fingerprint)
+        with _plan_cache_lock:
+            _plan_cache[fingerprint] = plan
+    return plan
@@ -0,0 +1,217 @@
+import os
+import re
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from utils.analysis import analyze_room
+
+SUMMARY_COLUMNS = [
+    'Room number', 'Room name', 'Start time', 'End time', 'Sensors', 'Data points',
+    'Temp mean (C)', 'Temp min (C)', 'Temp max (C)', 'Hot spot', 'Cold spot',
+    'RH mean (%RH)', 'RH min (%RH)', 'RH max (%RH)', 'Wet spot', 'Dry spot',
+    'Data loss warnings', 'Sheet', 'Status',
+]
+
+
+def _sensor_number(column):
+    return int(''.join(filter(str.isdigit, column)))
+
+
+class ConsolidatedReportWriter:
+    """
+    เขียนรายงาน Excel รวมของทั้ง study ในไฟล์เดียว โดยใช้ XlsxWriter แบบ constant memory
+
+    - sheet "Summary" สรุปทุกห้อง (เขียนตอน close)
+    - หนึ่ง sheet ต่อห้องสำหรับค่าสถิติและช่วงข้อมูลขาดหาย
+    - sheet ข้อมูลดิบและข้อมูลที่เติมค่าแล้วของแต่ละห้อง (ถ้าต้องการ)
+
+    ข้อมูลแต่ละแถวถูก flush ลงไฟล์ชั่วคราวทันที หน่วยความจำจึงคงที่ไม่ว่า study จะใหญ่แค่ไหน
+    """
+
+    def __init__(self, file_path, include_series=False):
+        # โหลด XlsxWriter เมื่อเขียนรายงานเท่านั้น
+        import xlsxwriter
+
+        self.file_path = file_path
+        self.include_series = include_series
+        self._workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True, 'nan_inf_to_errors': True})
+        self._bold = self._workbook.add_format({'bold': True})
+        self._number = self._workbook.add_format({'num_format': '0.0000'})
+        self._datetime = self._workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        self._warning = self._workbook.add_format({'font_color': 'red'})
+        # สร้าง Summary เป็น sheet แรก แต่เขียนข้อมูลตอน close
+        self._summary_sheet = self._workbook.add_worksheet("Summary")
+        self._summary_rows = []
+        self._sheet_names = {"summary"}
+
+    def _sheet_name(self, name):
+        """ตั้งชื่อ sheet ให้ถูกต้องตามข้อกำหนดของ Excel (ไม่เกิน 31 ตัวอักษรและไม่ซ้ำ)"""
+        name = re.sub(r"[\[\]:*?/\\]", "_", str(name).strip())[:31] or "Sheet"
+        candidate, counter = name, 2
+        while candidate.lower() in self._sheet_names:
+            suffix = f" ({counter})"
+            candidate = name[:31 - len(suffix)] + suffix
+            counter += 1
+        self._sheet_names.add(candidate.lower())
+        return candidate
+
+    def _write_stats_block(self, sheet, row, title, stats):
+        sheet.write(row, 0, title, self._bold)
+        row += 1
+        sheet.write(row, 0, "Statistic", self._bold)
+        for col, sensor in enumerate(stats.columns, start=1):
+            sheet.write(row, col, sensor, self._bold)
+        row += 1
+        for stat_name, values in stats.iterrows():
+            sheet.write(row, 0, stat_name)
+            for col, value in enumerate(values, start=1):
+                self._write_value(sheet, row, col, value)
+            row += 1
+        return row + 1
+
+    def _write_value(self, sheet, row, col, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+            sheet.write_blank(row, col, None)
+        elif isinstance(value, (pd.Timestamp, datetime)):
+            sheet.write_datetime(row, col, pd.Timestamp(value).to_pydatetime(), self._datetime)
+        elif isinstance(value, (int, float, np.integer, np.floating)):
+            sheet.write_number(row, col, float(value), self._number)
+        else:
+            sheet.write(row, col, value)
+
+    def _write_series_sheet(self, name, data):
+        """เขียนข้อมูลอนุกรมเวลาทีละแถว (ไม่สร้างสำเนาของ DataFrame)"""
+        sheet = self._workbook.add_worksheet(self._sheet_name(name))
+        sheet.set_column(0, 0, 20)
+        for col, column in enumerate(data.columns):
+            sheet.write(0, col, column, self._bold)
+        for row, values in enumerate(data.itertuples(index=False, name=None), start=1):
+            for col, value in enumerate(values):
+                self._write_value(sheet, row, col, value)
+        sheet.freeze_panes(1, 1)
+
+    def add_room(self, room, temp_stats, humidity_stats, data_loss_results, data_loss_warnings,
+                 data_points, raw_data=None, filled_data=None):
+        """
+        เพิ่มผลการวิเคราะห์ของหนึ่งห้องลงในรายงาน
+
+        Parameters:
+        room (dict): room_number, room_name, start_time, end_time, start_sensor, end_sensor
+        temp_stats, humidity_stats (DataFrame): ผลลัพธ์จาก calculate_statistics
+        data_loss_results, data_loss_warnings (list): ผลลัพธ์จาก check_data_loss
+        data_points (int): จำนวนแถวข้อมูลในช่วงเวลาของห้อง
+        raw_data, filled_data (DataFrame): ข้อมูลดิบและข้อมูลที่เติมค่าแล้ว (ใช้เมื่อ include_series=True)
+        """
+        room_label = f"{room['room_number']}".strip()
+
+        # คำนวณแถว Summary ก่อนเขียน sheet ใดๆ หากคำนวณไม่ได้ (เช่น ห้องที่ไม่มีค่าเลย) จะไม่มี sheet ที่เขียนค้างไว้
+        temp_means = temp_stats.loc['mean']
+        humidity_means = humidity_stats.loc['mean']
+        summary_row = [
+            room_label, str(room['room_name']).strip(), room['start_time'], room['end_time'],
+            f"{room['start_sensor']}-{room['end_sensor']}", data_points,
+            temp_means.mean(), temp_stats.loc['min'].min(), temp_stats.loc['max'].max(),
+            _sensor_number(temp_means.idxmax()), _sensor_number(temp_means.idxmin()),
+            humidity_means.mean(), humidity_stats.loc['min'].min(), humidity_stats.loc['max'].max(),
+            _sensor_number(humidity_means.idxmax()), _sensor_number(humidity_means.idxmin()),
+            len(data_loss_warnings),
+        ]
+
+        sheet_name = self._sheet_name(f"{room_label} Stats")
+        sheet = self._workbook.add_worksheet(sheet_name)
+        sheet.set_column(0, 0, 16)
+
+        sheet.write(0, 0, f"{room_label}: {str(room['room_name']).strip()}", self._bold)
+        sheet.write(1, 0, f"{room['start_time']} to {room['end_time']} (Sensors {room['start_sensor']}-{room['end_sensor']})")
+        row = self._write_stats_block(sheet, 3, "Temperature", temp_stats)
+        row = self._write_stats_block(sheet, row, "Humidity", humidity_stats)
+
+        sheet.write(row, 0, "Data Loss", self._bold)
+        row += 1
+        for warning in data_loss_warnings:
+            sheet.write(row, 0, warning, self._warning)
+            row += 1
+        for result in data_loss_results:
+            sheet.write(row, 0, result)
+            row += 1
+
+        if self.include_series:
+            if raw_data is not None:
+                self._write_series_sheet(f"{room_label} Raw", raw_data)
+            if filled_data is not None:
+                self._write_series_sheet(f"{room_label} Imputed", filled_data)
+
+        self._summary_rows.append(summary_row + [sheet_name, "OK"])
+
+    def add_room_error(self, room, message):
+        """บันทึกห้องที่วิเคราะห์ไม่ได้ลงใน Summary"""
+        row = [None] * len(SUMMARY_COLUMNS)
+        row[0] = f"{room['room_number']}".strip()
+        row[1] = str(room['room_name']).strip()
+        row[2] = room['start_time']
+        row[3] = room['end_time']
+        row[4] = f"{room['start_sensor']}-{room['end_sensor']}"
+        row[-1] = message
+        self._summary_rows.append(row)
+
+    def close(self):
+        """เขียน sheet Summary และปิดไฟล์"""
+        sheet = self._summary_sheet
+        sheet.set_column(0, len(SUMMARY_COLUMNS) - 1, 16)
+        for col, column in enumerate(SUMMARY_COLUMNS):
+            sheet.write(0, col, column, self._bold)
+        for row, values in enumerate(self._summary_rows, start=1):
+            for col, value in enumerate(values):
+                self._write_value(sheet, row, col, value)
+        sheet.freeze_panes(1, 2)
+        self._workbook.close()
+        return self.file_path
+
+
+def write_study_report(all_data, rooms, export_dir="data/reports", include_series=False, on_step=None):
+    """
+    วิเคราะห์ทุกห้องใน study และเขียนผลลงในไฟล์ Excel รวมไฟล์เดียว
+
+    วิเคราะห์และเขียนทีละห้อง แล้วทิ้งข้อมูลของห้องนั้นก่อนไปห้องถัดไป
+
+    Parameters:
+    all_data (DataFrame): ข้อมูลเซ็นเซอร์ทั้งหมด
+    rooms (list): รายการ dict ของแต่ละห้อง (room_number, room_name, start_time, end_time,
+                  start_sensor, end_sensor, additional_sensors, exclude_sensors)
+    export_dir (str): โฟลเดอร์สำหรับบันทึกรายงาน
+    include_series (bool): เขียนข้อมูลดิบและข้อมูลที่เติมค่าแล้วด้วยหรือไม่
+    on_step (callable): ฟังก์ชันที่ถูกเรียกเมื่อเริ่มแต่ละห้อง on_step(step_number, step_name)
+
+    Returns:
+    dict: report_path, rooms (จำนวนห้องที่วิเคราะห์สำเร็จ), failed_rooms
+    """
+    file_path = os.path.join(export_dir, f"study_report_{datetime.now():%Y%m%d_%H%M%S}.xlsx")
+    writer = ConsolidatedReportWriter(file_path, include_series)
+    failed_rooms = []
+
+    try:
+        for step, room in enumerate(rooms, start=1):
+            if on_step:
+                on_step(step, f"{room['room_number']}: {room['room_name']}")
+
+            try:
+                # ใช้ขั้นตอนเดียวกับการวิเคราะห์ห้องเดียว
+                analysis = analyze_room(all_data, room)
+                writer.add_room(room, analysis['temp_stats'], analysis['humidity_stats'],
+                                analysis['data_loss_results'], analysis['data_loss_warnings'],
+                                len(analysis['selected_data']), analysis['selected_data'], analysis['filled_data'])
+            except Exception as e:
+                writer.add_room_error(room, str(e))
+                failed_rooms.append(room['room_number'])
+
+        if on_step:
+            on_step(len(rooms) + 1, "Write summary")
+    finally:
+        writer.close()
+
+    return {
+        'report_path': file_path,
+        'rooms': len(rooms) - len(failed_rooms),
+        'failed_rooms': failed_rooms,
+    }
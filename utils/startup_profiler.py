@@ -0,0 +1,115 @@
+import os
+import ast
+import sys
+import subprocess
+
+# dependency ภายนอกที่ต้องการวัดเวลา import (โมดูลของแอปหาได้จาก app_modules())
+STARTUP_MODULES = [
+    "streamlit",
+    "pandas",
+    "numpy",
+    "plotly.graph_objects",
+    "openpyxl",
+    "xlsxwriter",
+    "google.generativeai",
+]
+
+# โมดูลที่ควรถูกโหลดเมื่อใช้งานครั้งแรกเท่านั้น ไม่ใช่ตอนเริ่มแอป
+LAZY_MODULES = ["google.generativeai", "plotly.graph_objects", "openpyxl", "xlsxwriter"]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(PROJECT_ROOT, "streamlit_app.py")
+
+
+def app_modules(app_file=APP_FILE):
+    """รายชื่อโมดูล utils.* ที่ไฟล์แอป import (อ่านจาก source ด้วย ast โดยไม่รันแอป)"""
+    with open(app_file, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=app_file)
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        modules.extend(name for name in names if name.startswith("utils.") and name not in modules)
+    return modules
+
+
+def measure_import_time(module_name):
+    """
+    วัดเวลา import แบบ cold start ของโมดูลหนึ่งตัว โดยรันใน process ใหม่ด้วย `python -X importtime`
+
+    Returns:
+    dict: module, status, self_ms (เวลาของโมดูลเอง), cumulative_ms (รวม dependency ทั้งหมด)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return {'module': module_name, 'status': "not installed", 'self_ms': None, 'cumulative_ms': None}
+
+    # รูปแบบบรรทัด: "import time:  self [us] | cumulative | imported package"
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or parts[2].strip() != module_name:
+            continue
+        return {
+            'module': module_name,
+            'status': "ok",
+            'self_ms': int(parts[0]) / 1000,
+            'cumulative_ms': int(parts[1]) / 1000,
+        }
+    # โมดูลถูกโหลดไปแล้วโดย interpreter (เช่น site-packages ที่ import ตอนเริ่ม)
+    return {'module': module_name, 'status': "preloaded", 'self_ms': 0.0, 'cumulative_ms': 0.0}
+
+
+def measure_startup(modules=None):
+    """วัดเวลา import ของทุกโมดูลใน STARTUP_MODULES และโมดูลของแอป (หรือรายการที่กำหนด)"""
+    return [measure_import_time(module) for module in (modules or STARTUP_MODULES + app_modules())]
+
+
+def find_eager_imports(entry_modules=None):
+    """
+    ตรวจสอบว่าโมดูลใน LAZY_MODULES ถูกโหลดตั้งแต่ import โมดูลของแอปหรือไม่ (ค่าเริ่มต้นคือทุกโมดูลจาก app_modules())
+
+    ไม่นับโมดูลที่ streamlit โหลดเองอยู่แล้ว (เช่น plotly.graph_objects สำหรับ theme)
+    """
+    entry_modules = entry_modules or app_modules()
+    code = (
+        "import sys\n"
+        "import streamlit\n"
+        "preloaded = set(sys.modules)\n"
+        + "".join(f"import {module}\n" for module in entry_modules)
+        + f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules and m not in preloaded))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Error importing app modules: {proc.stderr.strip()}")
+    output = proc.stdout.strip().splitlines()
+    return [module for module in output[-1].split(",") if module] if output else []
+
+
+def format_report(results, eager_modules):
+    """จัดรูปแบบผลการวัดเป็นตาราง"""
+    lines = [f"{'Module':<25}{'Self (ms)':>12}{'Cumulative (ms)':>18}  Status"]
+    for row in sorted(results, key=lambda r: r['cumulative_ms'] or 0, reverse=True):
+        self_ms = f"{row['self_ms']:.1f}" if row['self_ms'] is not None else "-"
+        cumulative_ms = f"{row['cumulative_ms']:.1f}" if row['cumulative_ms'] is not None else "-"
+        lines.append(f"{row['module']:<25}{self_ms:>12}{cumulative_ms:>18}  {row['status']}")
+
+    lines.append("")
+    if eager_modules:
+        lines.append(f"⚠️ Loaded at startup but should be lazy: {', '.join(eager_modules)}")
+    else:
+        lines.append("✅ Heavy optional modules are not loaded at startup")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python -m utils.startup_profiler [module ...]
+    print(format_report(measure_startup(sys.argv[1:]), find_eager_imports()))
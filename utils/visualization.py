@@ -1,11 +1,14 @@
-import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
+import numpy as np
 
 def create_temperature_chart(filled_data, sensor_columns_temp, room_number, room_name, start_sensor, end_sensor):
     """สร้างกราฟอุณหภูมิ"""
+    # โหลด Plotly เมื่อสร้างกราฟครั้งแรกเท่านั้น
+    import plotly.graph_objects as go
+    from plotly.colors import qualitative
+    
     # สร้างชุดสี
-    color_scale = px.colors.qualitative.Plotly
+    color_scale = qualitative.Plotly
     num_sensors = len(sensor_columns_temp)
     colors = color_scale * (num_sensors // len(color_scale) + 1)
     colors = colors[:num_sensors]
@@ -45,8 +48,12 @@ def create_temperature_chart(filled_data, sensor_columns_temp, room_number, room
 
 def create_humidity_chart(filled_data, sensor_columns_humidity, room_number, room_name, start_sensor, end_sensor):
     """สร้างกราฟความชื้น"""
+    # โหลด Plotly เมื่อสร้างกราฟครั้งแรกเท่านั้น
+    import plotly.graph_objects as go
+    from plotly.colors import qualitative
+    
     # สร้างชุดสี
-    color_scale = px.colors.qualitative.Plotly
+    color_scale = qualitative.Plotly
     num_sensors = len(sensor_columns_humidity)
     colors = color_scale * (num_sensors // len(color_scale) + 1)
     colors = colors[:num_sensors]
@@ -83,3 +90,122 @@ def create_humidity_chart(filled_data, sensor_columns_humidity, room_number, roo
     )
     
     return fig
+
+def build_heatmap_frames(filled_data, sensor_columns, max_frames=720):
+    """
+    เตรียมข้อมูลสำหรับ heatmap ล่วงหน้า โดย downsample เป็นค่าเฉลี่ยตามช่วงเวลา
+    
+    Parameters:
+    filled_data (DataFrame): ข้อมูลที่เติมค่าแล้ว
+    sensor_columns (list): คอลัมน์เซ็นเซอร์ (อุณหภูมิหรือความชื้น)
+    max_frames (int): จำนวน frame สูงสุด (ใช้กำหนดความละเอียดของการ downsample)
+    
+    Returns:
+    dict: sensors (list), timestamps (DatetimeIndex), values (ndarray ขนาด frame x เซ็นเซอร์), step_minutes (int)
+    """
+    columns = [col for col in sensor_columns if col in filled_data.columns]
+    sensors = [int(''.join(filter(str.isdigit, col))) for col in columns]
+    data = filled_data.set_index(pd.to_datetime(filled_data['timestamp']))[columns]
+    
+    # เลือกความละเอียดให้จำนวน frame ไม่เกิน max_frames
+    total_minutes = (data.index.max() - data.index.min()).total_seconds() / 60 if len(data) else 0
+    step_minutes = max(1, int(np.ceil(total_minutes / max_frames)))
+    resampled = data.resample(f"{step_minutes}min").mean()
+    
+    return {
+        'sensors': sensors,
+        'timestamps': resampled.index,
+        'values': resampled.to_numpy(dtype=float),
+        'step_minutes': step_minutes,
+    }
+
+def load_sensor_positions(file):
+    """อ่านตำแหน่งเซ็นเซอร์จากไฟล์ CSV ที่มีคอลัมน์ sensor, x, y"""
+    positions_df = pd.read_csv(file)
+    missing_cols = [col for col in ['sensor', 'x', 'y'] if col not in positions_df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing columns in sensor position file: {missing_cols}")
+    return {int(row.sensor): (float(row.x), float(row.y)) for row in positions_df.itertuples()}
+
+def default_sensor_positions(sensors):
+    """จัดตำแหน่งเซ็นเซอร์เป็นตารางตามลำดับหมายเลข (ใช้เมื่อไม่มีไฟล์ตำแหน่ง)"""
+    num_columns = max(1, int(np.ceil(np.sqrt(len(sensors)))))
+    return {sensor: (i % num_columns, -(i // num_columns)) for i, sensor in enumerate(sorted(sensors))}
+
+def create_heatmap_chart(frames, room_number, room_name, measure="Temperature", positions=None):
+    """สร้าง heatmap ของเซ็นเซอร์ในห้อง พร้อม slider และปุ่มเล่นภาพเคลื่อนไหว"""
+    # โหลด Plotly เมื่อสร้างกราฟครั้งแรกเท่านั้น
+    import plotly.graph_objects as go
+    
+    sensors = frames['sensors']
+    values = frames['values']
+    timestamps = frames['timestamps']
+    positions = positions or default_sensor_positions(sensors)
+    
+    # ใช้เฉพาะเซ็นเซอร์ที่มีตำแหน่ง
+    placed = [i for i, sensor in enumerate(sensors) if sensor in positions]
+    x = [positions[sensors[i]][0] for i in placed]
+    y = [positions[sensors[i]][1] for i in placed]
+    labels = [str(sensors[i]) for i in placed]
+    values = values[:, placed]
+    
+    # ใช้ช่วงสีเดียวกันทุก frame เพื่อให้เปรียบเทียบกันได้
+    color_min = float(np.nanmin(values)) if np.isfinite(values).any() else 0.0
+    color_max = float(np.nanmax(values)) if np.isfinite(values).any() else 1.0
+    unit = "C" if measure == "Temperature" else "%RH"
+    colorscale = "RdYlBu_r" if measure == "Temperature" else "BrBG"
+    
+    def frame_values(i):
+        return np.round(values[i], 2).tolist()
+    
+    def marker(i):
+        return dict(
+            color=frame_values(i), cmin=color_min, cmax=color_max, colorscale=colorscale,
+            size=36, symbol="square", colorbar=dict(title=unit), line=dict(width=1, color="black")
+        )
+    
+    # แต่ละ frame มีเฉพาะค่าสีและข้อความ ไม่สร้าง figure ใหม่ทุกช่วงเวลา
+    frame_names = [ts.strftime("%Y-%m-%d %H:%M") for ts in timestamps]
+    fig = go.Figure(
+        data=[go.Scatter(
+            x=x, y=y, mode="markers+text", text=labels, textfont=dict(size=10),
+            marker=marker(0), customdata=frame_values(0),
+            hovertemplate="Sensor %{text}: %{customdata} " + unit + "<extra></extra>"
+        )],
+        frames=[
+            go.Frame(name=name, data=[go.Scatter(marker=dict(color=frame_values(i)), customdata=frame_values(i))])
+            for i, name in enumerate(frame_names)
+        ]
+    )
+    
+    # ปรับแต่ง layout พร้อม slider และปุ่มเล่น
+    fig.update_layout(
+        title=dict(
+            text=f"<b>{measure} Heatmap for {room_number}: {room_name} ({frames['step_minutes']}-minute average)</b>",
+            font=dict(size=15, family="Arial", color="black")
+        ),
+        template="plotly",
+        height=600,
+        width=900,
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False, scaleanchor="x"),
+        updatemenus=[dict(
+            type="buttons", direction="left", x=0, y=-0.05, xanchor="left", yanchor="top",
+            buttons=[
+                dict(label="▶ Play", method="animate",
+                     args=[None, dict(frame=dict(duration=100, redraw=True), fromcurrent=True, transition=dict(duration=0))]),
+                dict(label="⏸ Pause", method="animate",
+                     args=[[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")]),
+            ]
+        )],
+        sliders=[dict(
+            active=0, x=0.15, len=0.85, y=-0.05, currentvalue=dict(prefix="Time: "),
+            steps=[
+                dict(label=name, method="animate",
+                     args=[[name], dict(frame=dict(duration=0, redraw=True), mode="immediate", transition=dict(duration=0))])
+                for name in frame_names
+            ]
+        )]
+    )
+    
+    return fig